@@ -0,0 +1,266 @@
+import argparse
+import bisect
+import glob
+import ipaddress
+import json
+import os
+import sys
+
+# ---------------------------
+# PATHS
+# ---------------------------
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Extra tenant parameter locations can be added with CF_TENANT_PARAMETER_PATTERNS
+# (glob patterns separated by os.pathsep).
+DEFAULT_PATTERNS = [
+    os.path.join(REPO_ROOT, "**", "parameters", "*.json"),
+] + [p for p in os.environ.get("CF_TENANT_PARAMETER_PATTERNS", "").split(os.pathsep) if p]
+
+VPC_CIDR_KEY = "VpcCidr"
+SUBNET_CIDR_SUFFIX = "SubnetCidrs"
+
+# ---------------------------
+# INTERVAL INDEX
+# ---------------------------
+class CidrIndex:
+    """Sorted, non-overlapping integer intervals for IPv4 blocks.
+
+    CIDR blocks are either nested or disjoint, so keeping the stored blocks
+    disjoint lets every overlap or containment query be answered with a
+    single bisect over the interval starts.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def _candidate(self, last_address):
+        position = bisect.bisect_right(self._starts, last_address) - 1
+        return self._entries[position] if position >= 0 else None
+
+    def find_overlap(self, network):
+        """Return the stored (start, end, network, owner) overlapping network, or None."""
+        first, last = int(network.network_address), int(network.broadcast_address)
+        entry = self._candidate(last)
+        if entry and entry[1] >= first:
+            return entry
+        return None
+
+    def containing(self, network):
+        """Return the stored entry that fully contains network, or None."""
+        entry = self.find_overlap(network)
+        if entry and entry[0] <= int(network.network_address) and entry[1] >= int(network.broadcast_address):
+            return entry
+        return None
+
+    def add(self, network, owner):
+        """Insert network; returns the conflicting entry instead if it overlaps."""
+        conflict = self.find_overlap(network)
+        if conflict:
+            return conflict
+        first = int(network.network_address)
+        position = bisect.bisect_left(self._starts, first)
+        self._starts.insert(position, first)
+        self._entries.insert(position, (first, int(network.broadcast_address), network, owner))
+        return None
+
+    def allocate(self, prefixlen, pool):
+        """Return the lowest free, aligned /prefixlen block inside pool, or None."""
+        if prefixlen < pool.prefixlen:
+            raise ValueError(f"Cannot allocate a /{prefixlen} inside {pool}")
+        size = 1 << (32 - prefixlen)
+        cursor, pool_end = int(pool.network_address), int(pool.broadcast_address)
+        position = max(bisect.bisect_right(self._starts, cursor) - 1, 0)
+
+        while cursor + size - 1 <= pool_end:
+            cursor = (cursor + size - 1) // size * size
+            if position < len(self._entries) and self._entries[position][1] < cursor:
+                position += 1
+                continue
+            if position < len(self._entries) and self._entries[position][0] <= cursor + size - 1:
+                cursor = self._entries[position][1] + 1
+                position += 1
+                continue
+            if cursor + size - 1 > pool_end:
+                break
+            return ipaddress.IPv4Network((cursor, prefixlen))
+        return None
+
+# ---------------------------
+# PARAMETER FILES
+# ---------------------------
+def discover_parameter_files(patterns=None):
+    paths = set()
+    for pattern in patterns or DEFAULT_PATTERNS:
+        if os.path.isfile(pattern):
+            paths.add(os.path.abspath(pattern))
+        paths.update(os.path.abspath(p) for p in glob.glob(pattern, recursive=True))
+    return sorted(paths)
+
+
+def parse_network(value):
+    return ipaddress.IPv4Network(value.strip(), strict=True)
+
+
+def load_plan(file_path):
+    """Read one parameter file into a CIDR plan: VPC block plus subnet blocks per key."""
+    with open(file_path, "r") as f:
+        params = {p["ParameterKey"]: p["ParameterValue"] for p in json.load(f)}
+    return plan_from_parameters(params, file_path)
+
+
+def plan_from_parameters(params, source):
+    """CIDR plan from {key: value} parameters, e.g. a compiled bundle; source names where they came from."""
+    plan = {
+        "source": os.path.abspath(source),
+        "name": params.get("ProjectName", os.path.basename(source)),
+        "vpc": None,
+        "subnets": [],
+        "problems": [],
+    }
+    for key, value in params.items():
+        if key != VPC_CIDR_KEY and not key.endswith(SUBNET_CIDR_SUFFIX):
+            continue
+        values = value if isinstance(value, list) else str(value).split(",")
+        for position, item in enumerate(v for v in values if v.strip()):
+            try:
+                network = parse_network(item)
+            except ValueError as e:
+                plan["problems"].append(f"{key}: invalid CIDR '{item.strip()}' ({e})")
+                continue
+            if key == VPC_CIDR_KEY:
+                plan["vpc"] = network
+            else:
+                plan["subnets"].append((key, position, network))
+    return plan
+
+
+def load_plans(patterns=None):
+    plans = []
+    for path in discover_parameter_files(patterns):
+        try:
+            plan = load_plan(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Skipping unreadable parameter file '{path}': {e}")
+            continue
+        if plan["vpc"] or plan["subnets"] or plan["problems"]:
+            plans.append(plan)
+    return plans
+
+# ---------------------------
+# CHECKS
+# ---------------------------
+def describe(plan):
+    return f"{plan['name']} ({os.path.relpath(plan['source'], REPO_ROOT)})"
+
+
+def check_plans(plans):
+    """Return (source, message) tuples for invalid, overlapping or uncontained CIDRs."""
+    problems = []
+    shared = CidrIndex()
+
+    for plan in plans:
+        problems.extend((plan["source"], message) for message in plan["problems"])
+
+        local = CidrIndex()
+        for key, position, network in plan["subnets"]:
+            label = f"{key}[{position}] {network}"
+            if plan["vpc"] and not plan["vpc"].supernet_of(network):
+                problems.append((plan["source"], f"{label} is outside VpcCidr {plan['vpc']}"))
+            conflict = local.add(network, label)
+            if conflict:
+                problems.append((plan["source"], f"{label} overlaps {conflict[3]}"))
+
+        # Tenants share the perimeter GWLB, so their VPC ranges must be disjoint.
+        blocks = [(VPC_CIDR_KEY, plan["vpc"])] if plan["vpc"] else [
+            (f"{key}[{position}]", network) for key, position, network in plan["subnets"]
+        ]
+        for label, network in blocks:
+            conflict = shared.add(network, (plan, label))
+            if conflict and conflict[3][0] is not plan:
+                other, other_label = conflict[3]
+                problems.append((plan["source"], f"{label} {network} overlaps {other_label} {conflict[2]} of {describe(other)}"))
+                problems.append((other["source"], f"{other_label} {conflict[2]} overlaps {label} {network} of {describe(plan)}"))
+    return problems
+
+
+def allocate_plan(template_plan, plans, pool):
+    """Lay out a new tenant shaped like template_plan in the next free VPC block of pool."""
+    if not template_plan["vpc"]:
+        raise ValueError(f"{describe(template_plan)} has no {VPC_CIDR_KEY} to copy the layout from")
+
+    taken = CidrIndex()
+    for plan in plans:
+        for network in [plan["vpc"]] if plan["vpc"] else [n for _, _, n in plan["subnets"]]:
+            taken.add(network, plan["name"])
+
+    vpc = taken.allocate(template_plan["vpc"].prefixlen, pool)
+    if vpc is None:
+        raise ValueError(f"No free /{template_plan['vpc'].prefixlen} left in {pool}")
+
+    inside = CidrIndex()
+    allocated = {VPC_CIDR_KEY: [vpc]}
+    for key, _, network in template_plan["subnets"]:
+        subnet = inside.allocate(network.prefixlen, vpc)
+        if subnet is None:
+            raise ValueError(f"{vpc} is too small for the subnet layout of {describe(template_plan)}")
+        inside.add(subnet, key)
+        allocated.setdefault(key, []).append(subnet)
+    return [
+        {"ParameterKey": key, "ParameterValue": ",".join(str(n) for n in networks)}
+        for key, networks in allocated.items()
+    ]
+
+
+def allocate_subnets(plan, count, prefixlen):
+    """Return count free /prefixlen blocks in the plan's VPC, lowest first, around its existing subnets."""
+    if not plan["vpc"]:
+        raise ValueError(f"{describe(plan)} has no {VPC_CIDR_KEY} to allocate subnets in")
+    taken = CidrIndex()
+    for key, position, network in plan["subnets"]:
+        taken.add(network, f"{key}[{position}]")
+    blocks = []
+    for _ in range(count):
+        block = taken.allocate(prefixlen, plan["vpc"])
+        if block is None:
+            raise ValueError(f"No free /{prefixlen} left in {VPC_CIDR_KEY} {plan['vpc']}")
+        taken.add(block, "allocated")
+        blocks.append(block)
+    return blocks
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and allocate tenant CIDR plans across parameter files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    check_parser = subparsers.add_parser("check", help="Report overlapping, invalid or uncontained CIDRs")
+    check_parser.add_argument("patterns", nargs="*", help="Parameter files or glob patterns (default: every parameters/*.json)")
+
+    allocate_parser = subparsers.add_parser("allocate", help="Allocate CIDRs for a new tenant")
+    allocate_parser.add_argument("--template", required=True, help="Parameter file whose CIDR layout is copied")
+    allocate_parser.add_argument("--pool", required=True, help="Supernet to allocate the new VpcCidr from (e.g. 10.0.0.0/8)")
+    allocate_parser.add_argument("patterns", nargs="*", help="Parameter files or glob patterns already in use")
+
+    args = parser.parse_args()
+    plans = load_plans(args.patterns)
+
+    if args.command == "check":
+        problems = check_plans(plans)
+        for source, message in problems:
+            print(f"[CONFLICT] {os.path.relpath(source, REPO_ROOT)}: {message}")
+        print(f"Checked {len(plans)} parameter files: {len(problems)} problems found.")
+        sys.exit(1 if problems else 0)
+
+    try:
+        print(json.dumps(allocate_plan(load_plan(args.template), plans, parse_network(args.pool)), indent=2))
+    except (OSError, ValueError) as e:
+        print(f"[FAILED] Allocation failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,53 @@
+import botocore.loaders
+import botocore.session
+
+# ---------------------------
+# SETTINGS
+# ---------------------------
+# Services the pipeline scripts create clients for, with one paginator and
+# one waiter each to pull in those definitions as well.
+WARM_SERVICES = {
+    "cloudformation": ("list_stacks", "stack_delete_complete"),
+    "ec2": ("describe_network_interfaces", None),
+    "elbv2": ("describe_load_balancers", None),
+    "autoscaling": ("describe_auto_scaling_groups", None),
+    "acm": ("list_certificates", None),
+    "sts": (None, None),
+}
+# Any valid region works: only endpoint data is resolved, nothing is called.
+WARM_REGION = "us-east-1"
+
+# ---------------------------
+# LOADER
+# ---------------------------
+# Imported by the deployment service's fork server, so the parsed service
+# models, endpoint data and paginator/waiter definitions live in this loader
+# before any job is forked; children reuse it through job_session().
+LOADER = botocore.loaders.create_loader()
+
+
+def warm():
+    """Build a client per service through LOADER with throwaway keys, caching everything it parses."""
+    session = botocore.session.get_session()
+    session.register_component("data_loader", LOADER)
+    for service, (paginator, waiter) in WARM_SERVICES.items():
+        client = session.create_client(service, region_name=WARM_REGION,
+                                       aws_access_key_id="warmup", aws_secret_access_key="warmup")
+        if paginator:
+            client.get_paginator(paginator)
+        if waiter:
+            client.get_waiter(waiter)
+
+
+def job_session():
+    """A fresh botocore session for this process's environment that shares the warm LOADER.
+
+    Profile, region and credentials are still resolved per job from the
+    environment; only the static service data is shared.
+    """
+    session = botocore.session.get_session()
+    session.register_component("data_loader", LOADER)
+    return session
+
+
+warm()
@@ -0,0 +1,77 @@
+from botocore.exceptions import BotoCoreError, ClientError
+
+from CF_tenant_common import dependency_drain, stack_diagnostics
+
+# ---------------------------
+# SETTINGS
+# ---------------------------
+# Retries after the first failed delete: at most one plain retry after a
+# successful drain, then RetainResources for whatever still blocks.
+MAX_RETRIES = 2
+
+
+class DeleteFailed(Exception):
+    """Raised by the cleanup wait loops as soon as a stack reports DELETE_FAILED."""
+
+    def __init__(self, stack_name, status="DELETE_FAILED"):
+        super().__init__(f"Stack {stack_name} reached {status}")
+        self.stack_name = stack_name
+        self.status = status
+
+# ---------------------------
+# RECOVERY
+# ---------------------------
+def blocking_resources(cf, stack_name):
+    """Return {logical_id: event} for the resources that failed the current delete."""
+    failures, _ = stack_diagnostics.find_failures(cf, stack_name)
+    return {event["LogicalResourceId"]: event for event in failures}
+
+
+def describe_blocker(event):
+    return (f"{event['LogicalResourceId']} ({event['ResourceType']}) {event.get('PhysicalResourceId', '')}: "
+            f"{event.get('ResourceStatusReason', '')}")
+
+
+def recover(cf, stack_name, wait, log=print):
+    """Finish a delete that ended in DELETE_FAILED; returns the retained resource events.
+
+    The first retry follows a dependency drain when the drain removed
+    something; otherwise, and on any later failure, the blocking resources
+    are retained so the stack itself is always removed. wait() must return
+    once the stack is gone and raise DeleteFailed on DELETE_FAILED.
+    """
+    retained = []
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            blockers = blocking_resources(cf, stack_name)
+        except (BotoCoreError, ClientError) as e:
+            log(f"[RECOVER] Could not read events for {stack_name}: {e}")
+            raise DeleteFailed(stack_name)
+        if not blockers:
+            log(f"[RECOVER] {stack_name} failed to delete but no failed resources were found.")
+            raise DeleteFailed(stack_name)
+        for event in blockers.values():
+            log(f"[RECOVER] Blocking {describe_blocker(event)}")
+
+        plan = dependency_drain.drain_stack(cf, stack_name, log=log) if attempt == 1 else None
+        if plan and plan["drain"] and not plan.get("failures"):
+            log(f"[RECOVER] Retrying delete of {stack_name} after draining its dependents.")
+            cf.delete_stack(StackName=stack_name)
+        else:
+            log(f"[RECOVER] Retrying delete of {stack_name} retaining {', '.join(sorted(blockers))}.")
+            cf.delete_stack(StackName=stack_name, RetainResources=sorted(blockers))
+            retained.extend(blockers.values())
+        try:
+            wait()
+            return retained
+        except DeleteFailed:
+            log(f"[RECOVER] Retry {attempt} of {stack_name} failed again.")
+    raise DeleteFailed(stack_name)
+
+
+def report_retained(stack_name, retained, log=print):
+    if not retained:
+        return
+    log(f"[RETAINED] {stack_name} was deleted but these resources were kept and need manual cleanup:")
+    for event in retained:
+        log(f"  {describe_blocker(event)}")
@@ -0,0 +1,413 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+# ---------------------------
+# SETTINGS
+# ---------------------------
+# Upper bound for the whole drain; the stack delete is issued afterwards either way.
+DRAIN_TIMEOUT = 600
+POLL_INTERVAL = 5
+MAX_WORKERS = 16
+FILTER_CHUNK = 200
+ELB_TAG_CHUNK = 20
+CFN_STACK_TAG = "aws:cloudformation:stack-name"
+
+VPC_TYPE = "AWS::EC2::VPC"
+SUBNET_TYPE = "AWS::EC2::Subnet"
+GONE_ENDPOINT_STATES = {"deleting", "deleted"}
+
+
+def chunks(values, size):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def tag_map(tags):
+    return {t["Key"]: t["Value"] for t in tags or []}
+
+
+def wait_until(check, deadline, interval=POLL_INTERVAL):
+    """Poll check() until it returns True or the deadline passes."""
+    while True:
+        if check():
+            return True
+        if time.time() + interval > deadline:
+            return False
+        time.sleep(interval)
+
+# ---------------------------
+# SCOPE
+# ---------------------------
+def network_scope(cf, stack_name):
+    """Return the (vpc_ids, subnet_ids) a stack owns."""
+    vpcs, subnets = set(), set()
+    paginator = cf.get_paginator("list_stack_resources")
+    for page in paginator.paginate(StackName=stack_name):
+        for resource in page["StackResourceSummaries"]:
+            physical_id = resource.get("PhysicalResourceId")
+            if not physical_id or resource["ResourceStatus"] == "DELETE_COMPLETE":
+                continue
+            if resource["ResourceType"] == VPC_TYPE:
+                vpcs.add(physical_id)
+            elif resource["ResourceType"] == SUBNET_TYPE:
+                subnets.add(physical_id)
+    return vpcs, subnets
+
+
+def expand_scope(ec2, vpcs, subnets):
+    """Add every subnet of the owned VPCs, and return the VPCs to search in."""
+    search_vpcs, scope = set(vpcs), set(subnets)
+    paginator = ec2.get_paginator("describe_subnets")
+    for chunk in chunks(vpcs, FILTER_CHUNK):
+        for page in paginator.paginate(Filters=[{"Name": "vpc-id", "Values": chunk}]):
+            scope.update(s["SubnetId"] for s in page["Subnets"])
+    for chunk in chunks(subnets, FILTER_CHUNK):
+        for page in paginator.paginate(Filters=[{"Name": "subnet-id", "Values": chunk}]):
+            search_vpcs.update(s["VpcId"] for s in page["Subnets"])
+    return search_vpcs, scope
+
+# ---------------------------
+# DISCOVERY
+# ---------------------------
+class Ownership:
+    """Decides whether a dependent belongs to another CloudFormation stack that is still live."""
+
+    def __init__(self, cf, stack_name):
+        self.cf = cf
+        self.stack_name = stack_name
+        self._live = {}
+
+    def protected_by(self, tags):
+        owner = tags.get(CFN_STACK_TAG)
+        if not owner or owner == self.stack_name:
+            return None
+        if owner not in self._live:
+            try:
+                status = self.cf.describe_stacks(StackName=owner)["Stacks"][0]["StackStatus"]
+                self._live[owner] = status != "DELETE_COMPLETE"
+            except ClientError as e:
+                # Only a confirmed missing stack makes its leftovers fair game.
+                self._live[owner] = "does not exist" not in str(e)
+        return owner if self._live[owner] else None
+
+
+def discover_load_balancers(elbv2, vpcs, subnets):
+    found = []
+    for page in elbv2.get_paginator("describe_load_balancers").paginate():
+        for lb in page["LoadBalancers"]:
+            lb_subnets = {az.get("SubnetId") for az in lb.get("AvailabilityZones", [])}
+            if lb.get("VpcId") in vpcs or lb_subnets & subnets:
+                found.append({"kind": "load_balancer", "id": lb["LoadBalancerArn"], "name": lb["LoadBalancerName"]})
+    arns = [lb["id"] for lb in found]
+    tags = {}
+    for chunk in chunks(arns, ELB_TAG_CHUNK):
+        for description in elbv2.describe_tags(ResourceArns=chunk)["TagDescriptions"]:
+            tags[description["ResourceArn"]] = tag_map(description.get("Tags"))
+    for lb in found:
+        lb["tags"] = tags.get(lb["id"], {})
+    return found
+
+
+def discover_vpc_endpoints(ec2, vpcs, search_vpcs, subnets):
+    found = []
+    paginator = ec2.get_paginator("describe_vpc_endpoints")
+    for chunk in chunks(search_vpcs, FILTER_CHUNK):
+        for page in paginator.paginate(Filters=[{"Name": "vpc-id", "Values": chunk}]):
+            for endpoint in page["VpcEndpoints"]:
+                if endpoint["State"].lower() in GONE_ENDPOINT_STATES:
+                    continue
+                if endpoint["VpcId"] in vpcs or set(endpoint.get("SubnetIds", [])) & subnets:
+                    found.append({
+                        "kind": "vpc_endpoint",
+                        "id": endpoint["VpcEndpointId"],
+                        "name": endpoint.get("ServiceName", ""),
+                        "tags": tag_map(endpoint.get("Tags")),
+                    })
+    return found
+
+
+def discover_auto_scaling_groups(autoscaling, subnets):
+    found = []
+    for page in autoscaling.get_paginator("describe_auto_scaling_groups").paginate():
+        for group in page["AutoScalingGroups"]:
+            group_subnets = {s.strip() for s in group.get("VPCZoneIdentifier", "").split(",") if s.strip()}
+            if group.get("Status") == "Delete in progress" or not group_subnets & subnets:
+                continue
+            found.append({
+                "kind": "auto_scaling_group",
+                "id": group["AutoScalingGroupName"],
+                "name": f"{len(group.get('Instances', []))} instances",
+                "instances": [i["InstanceId"] for i in group.get("Instances", [])],
+                "tags": tag_map(group.get("Tags")),
+            })
+    return found
+
+
+def discover_network_interfaces(ec2, search_vpcs, subnets):
+    """Return (drainable, managed) ENIs; managed ones are released by their owning service."""
+    drainable, managed = [], []
+    paginator = ec2.get_paginator("describe_network_interfaces")
+    for chunk in chunks(search_vpcs, FILTER_CHUNK):
+        for page in paginator.paginate(Filters=[{"Name": "vpc-id", "Values": chunk}]):
+            for eni in page["NetworkInterfaces"]:
+                if eni["SubnetId"] not in subnets:
+                    continue
+                attachment = eni.get("Attachment") or {}
+                entry = {
+                    "kind": "network_interface",
+                    "id": eni["NetworkInterfaceId"],
+                    "name": eni.get("Description", ""),
+                    "attachment": attachment.get("AttachmentId") if attachment.get("DeviceIndex", 0) > 0 else None,
+                    "instance": attachment.get("InstanceId"),
+                    "tags": tag_map(eni.get("TagSet")),
+                }
+                if eni.get("RequesterManaged") or attachment.get("DeviceIndex") == 0:
+                    managed.append(entry)
+                else:
+                    drainable.append(entry)
+    inherit_instance_owners(ec2, drainable)
+    return drainable, managed
+
+
+def inherit_instance_owners(ec2, interfaces):
+    """Give untagged ENIs the stack tag of the instance they are attached to.
+
+    A secondary ENI attached by another stack's instance is rarely tagged
+    itself; without this, Ownership would see no owner and detach it.
+    """
+    untagged = {eni["instance"] for eni in interfaces if eni["instance"] and CFN_STACK_TAG not in eni["tags"]}
+    owners = {}
+    paginator = ec2.get_paginator("describe_instances")
+    for chunk in chunks(untagged, FILTER_CHUNK):
+        for page in paginator.paginate(Filters=[{"Name": "instance-id", "Values": chunk}]):
+            for reservation in page["Reservations"]:
+                for instance in reservation["Instances"]:
+                    owner = tag_map(instance.get("Tags")).get(CFN_STACK_TAG)
+                    if owner:
+                        owners[instance["InstanceId"]] = owner
+    for eni in interfaces:
+        if eni["instance"] in owners and CFN_STACK_TAG not in eni["tags"]:
+            eni["tags"][CFN_STACK_TAG] = owners[eni["instance"]]
+
+
+def discover(cf, clients, stack_name):
+    """Find every dependent of the stack's VPCs and subnets, grouped into drain and skip lists."""
+    ec2, elbv2, autoscaling = clients["ec2"], clients["elbv2"], clients["autoscaling"]
+    vpcs, subnets = network_scope(cf, stack_name)
+    if not vpcs and not subnets:
+        return None
+    search_vpcs, subnets = expand_scope(ec2, vpcs, subnets)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        load_balancers = pool.submit(discover_load_balancers, elbv2, vpcs, subnets)
+        endpoints = pool.submit(discover_vpc_endpoints, ec2, vpcs, search_vpcs, subnets)
+        groups = pool.submit(discover_auto_scaling_groups, autoscaling, subnets)
+        interfaces = pool.submit(discover_network_interfaces, ec2, search_vpcs, subnets)
+        drainable_enis, managed_enis = interfaces.result()
+        candidates = load_balancers.result() + endpoints.result() + groups.result() + drainable_enis
+
+    ownership = Ownership(cf, stack_name)
+    plan = {"drain": [], "protected": [], "managed_enis": managed_enis, "subnets": subnets, "search_vpcs": search_vpcs}
+    for resource in candidates:
+        owner = ownership.protected_by(resource["tags"])
+        if owner:
+            resource["owner"] = owner
+            plan["protected"].append(resource)
+        else:
+            plan["drain"].append(resource)
+    return plan
+
+# ---------------------------
+# DRAIN ACTIONS
+# ---------------------------
+def drain_load_balancer(clients, resource, deadline):
+    clients["elbv2"].delete_load_balancer(LoadBalancerArn=resource["id"])
+
+    def gone():
+        try:
+            clients["elbv2"].describe_load_balancers(LoadBalancerArns=[resource["id"]])
+            return False
+        except ClientError as e:
+            return "LoadBalancerNotFound" in str(e)
+    return wait_until(gone, deadline)
+
+
+def drain_vpc_endpoints(clients, resources, deadline):
+    """Delete all endpoints in one call, then wait for the batch to disappear."""
+    ids = [r["id"] for r in resources]
+    response = clients["ec2"].delete_vpc_endpoints(VpcEndpointIds=ids)
+    failed = {item["ResourceId"] for item in response.get("Unsuccessful", [])}
+    pending = set(ids) - failed
+
+    def gone():
+        remaining = set()
+        for chunk in chunks(pending, FILTER_CHUNK):
+            for page in clients["ec2"].get_paginator("describe_vpc_endpoints").paginate(
+                Filters=[{"Name": "vpc-endpoint-id", "Values": chunk}]
+            ):
+                remaining.update(e["VpcEndpointId"] for e in page["VpcEndpoints"] if e["State"].lower() != "deleted")
+        pending.intersection_update(remaining)
+        return not pending
+    return wait_until(gone, deadline) and not failed
+
+
+def drain_auto_scaling_group(clients, resource, deadline):
+    # ForceDelete terminates the instances instead of waiting for a scale-in.
+    clients["autoscaling"].delete_auto_scaling_group(AutoScalingGroupName=resource["id"], ForceDelete=True)
+
+    def gone():
+        groups = clients["autoscaling"].describe_auto_scaling_groups(AutoScalingGroupNames=[resource["id"]])
+        return not groups["AutoScalingGroups"]
+    return wait_until(gone, deadline)
+
+
+def drain_network_interface(clients, resource, deadline):
+    ec2 = clients["ec2"]
+    if resource["attachment"]:
+        ec2.detach_network_interface(AttachmentId=resource["attachment"], Force=True)
+
+        def detached():
+            eni = ec2.describe_network_interfaces(NetworkInterfaceIds=[resource["id"]])["NetworkInterfaces"][0]
+            return eni["Status"] == "available"
+        if not wait_until(detached, deadline, interval=2):
+            return False
+    ec2.delete_network_interface(NetworkInterfaceId=resource["id"])
+    return True
+
+
+def released_by_drain(plan):
+    """Managed ENIs whose owner (load balancer, endpoint or ASG instance) is being drained."""
+    owners = set()
+    for resource in plan["drain"]:
+        if resource["kind"] == "load_balancer":
+            owners.add(resource["id"].split(":loadbalancer/", 1)[-1])
+        elif resource["kind"] == "vpc_endpoint":
+            owners.add(resource["id"])
+    instances = {i for r in plan["drain"] if r["kind"] == "auto_scaling_group" for i in r["instances"]}
+    return {
+        eni["id"] for eni in plan["managed_enis"]
+        if eni["instance"] in instances or any(owner in eni["name"] for owner in owners)
+    }
+
+
+def wait_for_managed_enis(clients, plan, deadline):
+    """Wait for the ENIs released by the drain to disappear; returns the IDs still present."""
+    pending = released_by_drain(plan)
+
+    def released():
+        remaining = set()
+        for chunk in chunks(pending, FILTER_CHUNK):
+            for page in clients["ec2"].get_paginator("describe_network_interfaces").paginate(
+                Filters=[{"Name": "network-interface-id", "Values": chunk}]
+            ):
+                remaining.update(eni["NetworkInterfaceId"] for eni in page["NetworkInterfaces"])
+        pending.intersection_update(remaining)
+        return not pending
+    wait_until(released, deadline)
+    return sorted(pending)
+
+
+def run_action(action, clients, target, deadline):
+    try:
+        return action(clients, target, deadline), None
+    except (BotoCoreError, ClientError) as e:
+        return False, e
+
+
+def execute(clients, plan, log=print, timeout=DRAIN_TIMEOUT):
+    """Drain every planned dependent concurrently; returns a list of failure messages."""
+    deadline = time.time() + timeout
+    endpoints = [r for r in plan["drain"] if r["kind"] == "vpc_endpoint"]
+    actions = [(drain_vpc_endpoints, endpoints, f"{len(endpoints)} VPC endpoints")] if endpoints else []
+    handlers = {
+        "load_balancer": drain_load_balancer,
+        "auto_scaling_group": drain_auto_scaling_group,
+        "network_interface": drain_network_interface,
+    }
+    for resource in plan["drain"]:
+        if resource["kind"] in handlers:
+            actions.append((handlers[resource["kind"]], resource, f"{resource['kind']} {resource['id']}"))
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = [(label, pool.submit(run_action, action, clients, target, deadline)) for action, target, label in actions]
+        for label, future in futures:
+            done, error = future.result()
+            if error:
+                failures.append(f"{label}: {error}")
+            elif not done:
+                failures.append(f"{label}: still present after {timeout}s")
+
+    # Load balancer, endpoint and instance ENIs are released asynchronously after their owner is gone.
+    remaining = wait_for_managed_enis(clients, plan, deadline)
+    failures.extend(f"network_interface {eni}: not released by its owning service" for eni in remaining)
+    for failure in failures:
+        log(f"[DRAIN] {failure}")
+    return failures
+
+
+def describe_resource(resource):
+    owner = f" (owned by live stack {resource['owner']})" if resource.get("owner") else ""
+    return f"{resource['kind']} {resource['id']} {resource.get('name', '')}".rstrip() + owner
+
+
+def make_clients(cf):
+    region = cf.meta.region_name
+    return {name: boto3.client(name, region_name=region) for name in ("ec2", "elbv2", "autoscaling")}
+
+
+def drain_stack(cf, stack_name, log=print, dry_run=False, clients=None):
+    """Remove dependents that would block deleting stack_name's VPCs and subnets.
+
+    Never raises: a drain that cannot finish is reported and the stack delete
+    goes ahead, leaving CloudFormation to report whatever is still blocking.
+    """
+    started = time.time()
+    try:
+        clients = clients or make_clients(cf)
+        plan = discover(cf, clients, stack_name)
+    except (BotoCoreError, ClientError) as e:
+        log(f"[DRAIN] Could not discover dependents of {stack_name}: {e}")
+        return None
+    if plan is None:
+        return None
+
+    for resource in plan["protected"]:
+        log(f"[DRAIN] Skipping {describe_resource(resource)}")
+    if not plan["drain"]:
+        log(f"[DRAIN] No dependents to remove for {stack_name}.")
+        return plan
+    for resource in plan["drain"]:
+        log(f"[DRAIN] {'Would remove' if dry_run else 'Removing'} {describe_resource(resource)}")
+    if dry_run:
+        return plan
+
+    plan["failures"] = execute(clients, plan, log)
+    log(f"[DRAIN] Drained {len(plan['drain'])} dependents of {stack_name} in {time.time() - started:.0f}s "
+        f"({len(plan['failures'])} problems).")
+    return plan
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain VPC and subnet dependents ahead of a stack delete.")
+    parser.add_argument("stacks", nargs="+", help="Stacks whose VPCs and subnets should be drained")
+    parser.add_argument("--region", help="AWS region (default: from the environment)")
+    parser.add_argument("--execute", action="store_true", help="Remove the dependents (default: only list them)")
+    args = parser.parse_args()
+
+    client = boto3.client("cloudformation", region_name=args.region)
+    problems = 0
+    for name in args.stacks:
+        result = drain_stack(client, name, dry_run=not args.execute)
+        if result is None:
+            print(f"[DRAIN] {name} owns no VPCs or subnets.")
+        problems += len(result.get("failures", [])) if result else 0
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+# ---------------------------
+# STORAGE
+# ---------------------------
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DB_PATH = os.environ.get("CF_TENANT_HISTORY_DB", os.path.join(REPO_ROOT, ".deployment_history.sqlite3"))
+
+# A run is a regression when it is this much slower than the median of
+# the previous successful runs of the same stack and operation.
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 60
+BASELINE_RUNS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stack TEXT NOT NULL,
+    tenant TEXT,
+    region TEXT,
+    operation TEXT NOT NULL,
+    template_hash TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    poll_count INTEGER,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_stack ON runs (stack, operation, outcome, started_at);
+"""
+SUCCESS_OUTCOMES = ("SUCCESS",)
+
+
+def connect(db_path=None):
+    connection = sqlite3.connect(db_path or DB_PATH, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def template_hash(template_body):
+    if template_body is None:
+        return None
+    return hashlib.sha256(template_body.encode("utf-8")).hexdigest()[:16]
+
+
+def tenant_from_parameters(parameters):
+    """ProjectName from either a {key: value} dict or a CloudFormation Parameters list."""
+    if isinstance(parameters, dict):
+        return parameters.get("ProjectName")
+    for param in parameters or []:
+        if param.get("ParameterKey") == "ProjectName":
+            return param.get("ParameterValue")
+    return None
+
+
+def record(stack, operation, started_at, ended_at, outcome, tenant=None, region=None,
+           template_body=None, poll_count=None, db_path=None):
+    with contextlib.closing(connect(db_path)) as connection, connection:
+        connection.execute(
+            "INSERT INTO runs (stack, tenant, region, operation, template_hash, started_at, ended_at, poll_count, outcome) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (stack, tenant, region, operation, template_hash(template_body), started_at, ended_at, poll_count, outcome),
+        )
+
+
+@contextlib.contextmanager
+def track(stack, operation, tenant=None, region=None, template_body=None, log=print, db_path=None):
+    """Record one stack operation; the caller updates run["polls"], run["operation"] and run["outcome"].
+
+    Any exception (including sys.exit) is recorded as FAILED and re-raised.
+    History is best effort: storage errors are logged, never raised.
+    """
+    run = {"operation": operation, "polls": 0, "outcome": "SUCCESS"}
+    started_at = time.time()
+    try:
+        yield run
+    except BaseException:
+        run["outcome"] = "FAILED"
+        raise
+    finally:
+        ended_at = time.time()
+        try:
+            record(stack, run["operation"], started_at, ended_at, run["outcome"], tenant, region,
+                   template_body, run["polls"], db_path)
+            if run["outcome"] in SUCCESS_OUTCOMES:
+                warning = check_regression(stack, run["operation"], ended_at - started_at, tenant, region, db_path)
+                if warning:
+                    log(warning)
+        except sqlite3.Error as e:
+            log(f"Could not record deployment history for {stack}: {e}")
+
+# ---------------------------
+# QUERIES
+# ---------------------------
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def durations(connection, stack, operation, tenant=None, region=None, before=None, limit=BASELINE_RUNS):
+    """Successful run times of one stack, newest first, for the same tenant and region only.
+
+    IS rather than = so runs recorded without a tenant or region compare with each other.
+    """
+    query = ("SELECT ended_at - started_at FROM runs WHERE stack = ? AND operation = ? "
+             "AND tenant IS ? AND region IS ? AND outcome = 'SUCCESS'")
+    args = [stack, operation, tenant, region]
+    if before is not None:
+        query += " AND started_at < ?"
+        args.append(before)
+    query += " ORDER BY started_at DESC LIMIT ?"
+    args.append(limit)
+    return [row[0] for row in connection.execute(query, args)]
+
+
+def is_regression(duration, baseline):
+    return (
+        baseline is not None
+        and duration > baseline * REGRESSION_FACTOR
+        and duration - baseline >= REGRESSION_MIN_SECONDS
+    )
+
+
+def check_regression(stack, operation, duration, tenant=None, region=None, db_path=None):
+    """Compare the latest run against the median of the runs before it in the same tenant and region."""
+    with contextlib.closing(connect(db_path)) as connection:
+        previous = durations(connection, stack, operation, tenant, region, limit=BASELINE_RUNS + 1)[1:]
+    baseline = percentile(previous, 0.5)
+    if is_regression(duration, baseline):
+        return (f"[SLOW] {stack} {operation} took {duration:.0f}s, "
+                f"{duration / baseline:.1f}x its baseline of {baseline:.0f}s over {len(previous)} runs")
+    return None
+
+
+def summary(connection, stack=None, since=None):
+    query = ("SELECT stack, operation, ended_at - started_at, outcome, poll_count FROM runs WHERE 1 = 1")
+    args = []
+    if stack:
+        query += " AND stack = ?"
+        args.append(stack)
+    if since:
+        query += " AND started_at >= ?"
+        args.append(since)
+    rows = {}
+    for name, operation, duration, outcome, polls in connection.execute(query + " ORDER BY started_at", args):
+        entry = rows.setdefault((name, operation), {"durations": [], "runs": 0, "failed": 0, "polls": []})
+        entry["runs"] += 1
+        if outcome == "SUCCESS":
+            entry["durations"].append(duration)
+            if polls is not None:
+                entry["polls"].append(polls)
+        elif outcome == "FAILED":
+            entry["failed"] += 1
+    return rows
+
+
+def regressions(connection, stack=None, since=None):
+    query = ("SELECT stack, operation, started_at, ended_at - started_at, template_hash, tenant, region "
+             "FROM runs WHERE outcome = 'SUCCESS'")
+    args = []
+    if stack:
+        query += " AND stack = ?"
+        args.append(stack)
+    if since:
+        query += " AND started_at >= ?"
+        args.append(since)
+    flagged = []
+    for name, operation, started_at, duration, digest, tenant, region in connection.execute(query, args).fetchall():
+        previous = durations(connection, name, operation, tenant, region, before=started_at)
+        baseline = percentile(previous, 0.5)
+        if is_regression(duration, baseline):
+            hashes = {row[0] for row in connection.execute(
+                "SELECT template_hash FROM runs WHERE stack = ? AND operation = ? AND tenant IS ? AND region IS ? "
+                "AND outcome = 'SUCCESS' AND started_at < ? ORDER BY started_at DESC LIMIT ?",
+                (name, operation, tenant, region, started_at, BASELINE_RUNS),
+            )}
+            flagged.append({
+                "stack": name, "operation": operation, "tenant": tenant, "region": region,
+                "started_at": started_at, "duration": duration, "baseline": baseline,
+                "template_changed": digest not in hashes,
+            })
+    return flagged
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.0f}s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the local stack deployment history.")
+    parser.add_argument("command", choices=["report", "regressions"], help="report: p50/p95 per stack; regressions: slow runs")
+    parser.add_argument("--stack", help="Only this stack")
+    parser.add_argument("--days", type=float, help="Only runs from the last N days")
+    parser.add_argument("--db", help=f"History database (default: {DB_PATH})")
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 86400 if args.days else None
+    if not os.path.isfile(args.db or DB_PATH):
+        print(f"No deployment history found at {args.db or DB_PATH}")
+        sys.exit(0)
+
+    with contextlib.closing(connect(args.db)) as connection:
+        if args.command == "report":
+            print(f"{'STACK':<28} {'OPERATION':<10} {'RUNS':>5} {'FAILED':>6} {'P50':>8} {'P95':>8} {'POLLS':>6}")
+            for (name, operation), entry in sorted(summary(connection, args.stack, since).items()):
+                p50, p95 = percentile(entry["durations"], 0.5), percentile(entry["durations"], 0.95)
+                polls = percentile(entry["polls"], 0.5)
+                print(f"{name:<28} {operation:<10} {entry['runs']:>5} {entry['failed']:>6} "
+                      f"{format_seconds(p50):>8} {format_seconds(p95):>8} {'-' if polls is None else polls:>6}")
+        else:
+            flagged = regressions(connection, args.stack, since)
+            for run in flagged:
+                note = " (template changed)" if run["template_changed"] else ""
+                print(f"[SLOW] {format_time(run['started_at'])} {run['stack']} {run['operation']} "
+                      f"tenant={run['tenant'] or '-'} region={run['region'] or '-'}: "
+                      f"{run['duration']:.0f}s vs baseline {run['baseline']:.0f}s{note}")
+            print(f"{len(flagged)} slow runs found.")
+            sys.exit(1 if flagged else 0)
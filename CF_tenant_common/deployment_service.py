@@ -0,0 +1,578 @@
+import argparse
+import hmac
+import http.client
+import json
+import multiprocessing
+import os
+import runpy
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from CF_tenant_common import cidr_planner, client_warmup, impact_analysis  # noqa: E402
+from CF_tenant_common.pipelines import PIPELINES  # noqa: E402
+
+# ---------------------------
+# SETTINGS
+# ---------------------------
+ACTIONS = ("deploy", "cleanup", "preview")
+
+# The service runs deployments with the caller's AWS credentials, so by
+# default it only listens on a Unix socket readable by its owner; TCP needs
+# a shared token (--token or CF_DEPLOY_SERVICE_TOKEN).
+DEFAULT_SOCKET = os.path.join(REPO_ROOT, ".deployment_service.sock")
+TOKEN_ENV = "CF_DEPLOY_SERVICE_TOKEN"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8
+DEFAULT_ACCOUNT_CONCURRENCY = 4
+MAX_FINISHED_JOBS = 1000
+# Modules imported once in the fork server so every job starts warm;
+# client_warmup also parses the botocore service data the scripts need.
+PRELOAD = [
+    "boto3", "botocore.exceptions", "CF_tenant_common.client_warmup",
+    "CF_tenant_common.stack_diagnostics", "CF_tenant_common.deployment_history",
+]
+
+# ---------------------------
+# JOBS
+# ---------------------------
+class Job:
+    """One deploy, cleanup or preview request and its output so far."""
+
+    def __init__(self, request, account):
+        self.id = uuid.uuid4().hex[:12]
+        self.pipeline = request["pipeline"]
+        self.action = request["action"]
+        self.tenant = request["tenant"]
+        self.stacks = request.get("stacks") or []
+        self.profile = request.get("profile")
+        self.region = request.get("region")
+        self.base = request.get("base") or "HEAD"
+        self.account = account
+        self.status = "queued"
+        self.exit_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.ended_at = None
+        self.lines = []
+        self._changed = threading.Condition()
+
+    @property
+    def lock_key(self):
+        # Stack names are fixed per pipeline, so two jobs for the same
+        # pipeline in one account and region would operate on the same stacks.
+        return (self.account, self.region, self.pipeline)
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def emit(self, line):
+        with self._changed:
+            self.lines.append(line.rstrip("\n"))
+            self._changed.notify_all()
+
+    def set_status(self, status, exit_code=None):
+        with self._changed:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            if status in ("succeeded", "failed"):
+                self.ended_at = time.time()
+                self.exit_code = exit_code
+            self._changed.notify_all()
+
+    def follow(self):
+        """Yield output lines as they arrive until the job has finished."""
+        position = 0
+        while True:
+            with self._changed:
+                while position == len(self.lines) and not self.finished:
+                    self._changed.wait()
+                lines, position = self.lines[position:], len(self.lines)
+                done = self.finished
+            yield from lines
+            if done:
+                return
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "pipeline": self.pipeline,
+            "action": self.action,
+            "tenant": self.tenant,
+            "stacks": self.stacks,
+            "account": self.account,
+            "region": self.region,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "lines": len(self.lines),
+        }
+
+
+def validate_request(request):
+    if not isinstance(request, dict):
+        raise ValueError("Job request must be a JSON object")
+    if request.get("pipeline") not in PIPELINES:
+        raise ValueError(f"pipeline must be one of: {', '.join(PIPELINES)}")
+    if request.get("action") not in ACTIONS:
+        raise ValueError(f"action must be one of: {', '.join(ACTIONS)}")
+    if not request.get("tenant"):
+        raise ValueError("tenant is required")
+    stacks = request.get("stacks")
+    if stacks is not None and (not isinstance(stacks, list) or not all(isinstance(s, str) for s in stacks)):
+        raise ValueError("stacks must be a list of stack names")
+    if stacks and request["action"] != "deploy":
+        raise ValueError("stacks can only be selected for deploy jobs")
+    return request
+
+# ---------------------------
+# SCRIPT RUNNER (child process)
+# ---------------------------
+class PipeWriter:
+    """File-like stdout replacement that forwards complete lines to the service."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            self.conn.send(line)
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.conn.send(self.buffer)
+            self.buffer = ""
+
+    def isatty(self):
+        return False
+
+
+def run_script(directory, script, argv, env, conn):
+    """Run a pipeline script as __main__ in this (forked) process."""
+    os.environ.update(env)
+    # The scripts' boto3.client() calls use the default session; giving it the
+    # fork server's loader skips re-reading and parsing the service models.
+    boto3.setup_default_session(botocore_session=client_warmup.job_session())
+    os.chdir(directory)
+    sys.stdout = sys.stderr = PipeWriter(conn)
+    sys.argv = [script] + argv
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        conn.close()
+    sys.exit(code)
+
+# ---------------------------
+# WARM STATE
+# ---------------------------
+class WarmState:
+    """Clients and derived data reused across jobs, refreshed only when their inputs change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._graph = (None, None)
+        self._plans = (None, None)
+
+    def account_for(self, profile=None):
+        with self._lock:
+            if profile not in self._accounts:
+                session = boto3.session.Session(profile_name=profile)
+                self._accounts[profile] = session.client("sts").get_caller_identity()["Account"]
+            return self._accounts[profile]
+
+    @staticmethod
+    def region_for(profile=None):
+        """Region a job without an explicit region would run in."""
+        region = boto3.session.Session(profile_name=profile).region_name
+        if not region:
+            raise ValueError("region is required: no default region is configured for this profile")
+        return region
+
+    @staticmethod
+    def tree_signature():
+        """Latest mtime and file count of every pipeline script, template and parameter file."""
+        latest, count = 0, 0
+        for pipeline in PIPELINES.values():
+            for root, _, files in os.walk(os.path.join(REPO_ROOT, pipeline["dir"])):
+                for name in files:
+                    if name.endswith((".py", ".yaml", ".json")):
+                        latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+                        count += 1
+        return latest, count
+
+    def graph(self):
+        signature = self.tree_signature()
+        with self._lock:
+            if self._graph[0] != signature:
+                self._graph = (signature, impact_analysis.build_graph())
+            return self._graph[1]
+
+    def plans(self):
+        signature = self.tree_signature()
+        with self._lock:
+            if self._plans[0] != signature:
+                self._plans = (signature, cidr_planner.load_plans())
+            return self._plans[1]
+
+# ---------------------------
+# SCHEDULER
+# ---------------------------
+class Scheduler:
+    """Runs jobs on a shared worker pool with per-account and per-pipeline limits."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, account_concurrency=DEFAULT_ACCOUNT_CONCURRENCY):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.account_concurrency = account_concurrency
+        self.warm = WarmState()
+        self.jobs = {}
+        self._pending = deque()
+        self._running = {}
+        self._locked = set()
+        self._lock = threading.Lock()
+        self._context = self._process_context()
+
+    @staticmethod
+    def _process_context():
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(PRELOAD)
+            return context
+        return multiprocessing.get_context("spawn")
+
+    def submit(self, request):
+        request = validate_request(request)
+        account = self.warm.account_for(request.get("profile"))
+        # Resolved here so jobs with and without an explicit region share one lock key.
+        request["region"] = request.get("region") or self.warm.region_for(request.get("profile"))
+        job = Job(request, account)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._pending.append(job)
+            self._forget_finished()
+            self._dispatch()
+        return job
+
+    def _forget_finished(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.id]
+
+    def _dispatch(self):
+        """Start every pending job whose account and pipeline have room; caller holds the lock."""
+        waiting = deque()
+        while self._pending:
+            job = self._pending.popleft()
+            if self._running.get(job.account, 0) >= self.account_concurrency or job.lock_key in self._locked:
+                waiting.append(job)
+                continue
+            self._running[job.account] = self._running.get(job.account, 0) + 1
+            self._locked.add(job.lock_key)
+            self.pool.submit(self._run, job)
+        self._pending = waiting
+
+    def _run(self, job):
+        job.set_status("running")
+        try:
+            code = self._preview(job) if job.action == "preview" else self._execute(job)
+        except Exception as e:
+            job.emit(f"[FAILED] {type(e).__name__}: {e}")
+            code = 1
+        job.set_status("succeeded" if code == 0 else "failed", code)
+        with self._lock:
+            self._running[job.account] -= 1
+            self._locked.discard(job.lock_key)
+            self._dispatch()
+
+    def _execute(self, job):
+        pipeline = PIPELINES[job.pipeline]
+        argv = ["--stacks", ",".join(job.stacks)] if job.stacks else []
+        env = {"CF_TENANT": job.tenant, "PYTHONUNBUFFERED": "1"}
+        if job.profile:
+            env["AWS_PROFILE"] = job.profile
+        env["AWS_DEFAULT_REGION"] = job.region
+
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=run_script,
+            args=(os.path.join(REPO_ROOT, pipeline["dir"]), pipeline[job.action], argv, env, sender),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        while True:
+            try:
+                job.emit(receiver.recv())
+            except EOFError:
+                break
+        receiver.close()
+        process.join()
+        return process.exitcode
+
+    def _preview(self, job):
+        """List the stacks a deploy would touch and any CIDR conflicts, using the warm caches."""
+        pipeline_dir = PIPELINES[job.pipeline]["dir"].replace(os.sep, "/")
+        graph = self.warm.graph()
+        affected = impact_analysis.impacted(graph, impact_analysis.changed_files(job.base), job.base)
+        names = [s["name"] for s in graph.values() if s["pipeline"] == pipeline_dir and s["name"] in affected]
+        if not names:
+            job.emit(f"No {job.pipeline} stacks affected relative to {job.base}.")
+        for name in names:
+            job.emit(f"  {name}: {affected[name]}")
+
+        pipeline_root = os.path.join(REPO_ROOT, PIPELINES[job.pipeline]["dir"]) + os.sep
+        problems = [
+            (source, message) for source, message in cidr_planner.check_plans(self.warm.plans())
+            if source.startswith(pipeline_root)
+        ]
+        for source, message in problems:
+            job.emit(f"[CONFLICT] {os.path.relpath(source, REPO_ROOT)}: {message}")
+        if names:
+            job.emit(f"deploy with: --stacks {','.join(names)}")
+        return 1 if problems else 0
+
+# ---------------------------
+# HTTP API
+# ---------------------------
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """POST /jobs, GET /jobs, GET /jobs/<id> and GET /jobs/<id>/stream (JSON lines)."""
+
+    server_version = "CFTenantDeploymentService/1"
+
+    def address_string(self):
+        # Unix socket peers have no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def authorized(self):
+        token = self.server.token
+        if not token:
+            return True
+        supplied = self.headers.get("Authorization", "")
+        if hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            return True
+        self.send_json(401, {"error": "Missing or invalid service token"})
+        return False
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def find_job(self, job_id):
+        job = self.server.scheduler.jobs.get(job_id)
+        if job is None:
+            self.send_json(404, {"error": f"Unknown job {job_id}"})
+        return job
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = self.server.scheduler.submit(json.loads(self.rfile.read(length) or b"{}"))
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": f"Could not queue job: {e}"})
+            return
+        self.send_json(202, job.summary())
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        parts = [p for p in self.path.split("/") if p]
+        if parts == ["jobs"]:
+            self.send_json(200, [job.summary() for job in list(self.server.scheduler.jobs.values())])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.find_job(parts[1])
+            if job:
+                self.send_json(200, dict(job.summary(), output=list(job.lines)))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+            job = self.find_job(parts[1])
+            if job:
+                self.stream(job)
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def stream(self, job):
+        # HTTP/1.0 style: the body is JSON lines terminated by closing the connection.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for line in job.follow():
+                self.wfile.write((json.dumps({"line": line}) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write((json.dumps(job.summary()) + "\n").encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        os.chmod(self.server_address, 0o600)
+
+
+def make_server(scheduler, host=None, port=DEFAULT_PORT, socket_path=DEFAULT_SOCKET, token=None):
+    """Serve on socket_path, or on host:port when a host is given; TCP requires a token."""
+    if host:
+        if not token:
+            raise ValueError(f"A service token (--token or {TOKEN_ENV}) is required to listen on TCP")
+        server = ThreadingHTTPServer((host, port), JobRequestHandler)
+        server.daemon_threads = True
+    else:
+        server = UnixHTTPServer(socket_path, JobRequestHandler)
+    server.scheduler = scheduler
+    server.token = token
+    return server
+
+# ---------------------------
+# CLIENT
+# ---------------------------
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def open_connection(args):
+    if args.host:
+        return http.client.HTTPConnection(args.host, args.port)
+    return UnixHTTPConnection(args.socket)
+
+
+def auth_headers(args, headers=None):
+    headers = dict(headers or {})
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+    return headers
+
+
+def submit_job(args):
+    request = {"pipeline": args.pipeline, "action": args.action, "tenant": args.tenant}
+    for key in ("profile", "region", "base"):
+        if getattr(args, key):
+            request[key] = getattr(args, key)
+    if args.stacks:
+        request["stacks"] = [s.strip() for s in args.stacks.split(",") if s.strip()]
+
+    connection = open_connection(args)
+    connection.request("POST", "/jobs", body=json.dumps(request),
+                       headers=auth_headers(args, {"Content-Type": "application/json"}))
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    if response.status != 202:
+        print(f"[FAILED] {payload.get('error', response.reason)}")
+        return 1
+    print(f"[QUEUED] Job {payload['id']} ({args.pipeline} {args.action} for {args.tenant})")
+    if not args.follow:
+        return 0
+
+    connection = open_connection(args)
+    connection.request("GET", f"/jobs/{payload['id']}/stream", headers=auth_headers(args))
+    response = connection.getresponse()
+    summary = {}
+    for raw in response:
+        message = json.loads(raw)
+        if "line" in message:
+            print(message["line"])
+        else:
+            summary = message
+    connection.close()
+    print(f"[{summary.get('status', 'unknown').upper()}] Job {payload['id']}")
+    return summary.get("exit_code") or 0
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running deployment service with a job queue and worker pool.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to serve on or connect to")
+    parser.add_argument("--host", help="Use HTTP on this address instead of the Unix socket (requires a token)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="HTTP port, with --host")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"Shared service token (default: ${TOKEN_ENV})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the job service")
+    serve_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Jobs running at once across all accounts")
+    serve_parser.add_argument("--account-concurrency", type=int, default=DEFAULT_ACCOUNT_CONCURRENCY,
+                              help="Jobs running at once per AWS account")
+
+    submit_parser = subparsers.add_parser("submit", help="Queue a job on a running service")
+    submit_parser.add_argument("--pipeline", required=True, choices=sorted(PIPELINES))
+    submit_parser.add_argument("--action", required=True, choices=ACTIONS)
+    submit_parser.add_argument("--tenant", required=True, help="Tenant (ProjectName) the job is for")
+    submit_parser.add_argument("--stacks", help="Comma-separated stacks to deploy (default: all)")
+    submit_parser.add_argument("--profile", help="AWS profile the job runs with")
+    submit_parser.add_argument("--region", help="AWS region the job runs in")
+    submit_parser.add_argument("--base", help="Git ref preview jobs diff against (default: HEAD)")
+    submit_parser.add_argument("--follow", action="store_true", help="Stream job output until it finishes")
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        try:
+            sys.exit(submit_job(args))
+        except (OSError, http.client.HTTPException) as e:
+            print(f"[FAILED] Could not reach the deployment service: {e}")
+            sys.exit(1)
+
+    try:
+        server = make_server(Scheduler(args.workers, args.account_concurrency),
+                             args.host, args.port, args.socket, args.token)
+    except (OSError, ValueError) as e:
+        print(f"[FAILED] {e}")
+        sys.exit(1)
+    print(f"Deployment service listening on {f'http://{args.host}:{args.port}' if args.host else args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
@@ -0,0 +1,371 @@
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import deque
+
+# ---------------------------
+# PIPELINES
+# ---------------------------
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+PIPELINES = [
+    "CF_tenant_perimeter_setup/perimeter_security_setup",
+    "CF_tenant_perimeter_setup/egress_security_setup",
+    "CF_tenant_integration_setup",
+]
+DEPLOY_SCRIPT = "deployment.py"
+GENERATOR_DIR = "CF_tenant_perimeter_setup"
+GENERATOR_SCRIPT = "template_generator.py"
+SPEC_DIR = "template_specs"
+
+PARAM_MARKER = "@param:"
+SUB_VARIABLE = re.compile(r"\$\{([^}]+)\}")
+
+# ---------------------------
+# PYTHON WIRING
+# ---------------------------
+def call_name(node):
+    if isinstance(node, ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name):
+            return func.id
+        if isinstance(func, ast.Attribute):
+            return func.attr
+    return None
+
+
+def resolve_path(node, strings):
+    """Resolve os.path.join/abspath chains of constants and known string variables."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return strings.get(node.id)
+    if call_name(node) in ("join", "abspath") and node.args:
+        parts = [resolve_path(arg, strings) for arg in node.args]
+        if all(part is not None for part in parts):
+            return os.path.normpath(os.path.join(*parts))
+    return None
+
+
+def subscript_key(node):
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        if isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+            return f"{node.value.id}[{node.slice.value}]"
+    return None
+
+
+def sources(node, taint):
+    """Upstream stacks and base parameter keys an expression reads from."""
+    found = set()
+    for child in ast.walk(node):
+        if call_name(child) == "get_stack_output" and child.args:
+            if isinstance(child.args[0], ast.Constant):
+                found.add(child.args[0].value)
+        elif isinstance(child, ast.Name) and child.id in taint:
+            found |= taint[child.id]
+        else:
+            key = subscript_key(child)
+            if key in taint:
+                found |= taint[key]
+            elif key:
+                found.add(PARAM_MARKER + child.slice.value)
+    return found
+
+
+def find_paths(node, strings, suffixes):
+    paths = []
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Call, ast.Name)):
+            path = resolve_path(child, strings)
+            if path and path.endswith(suffixes) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def analyse_procedural(pipeline, tree):
+    """Walk main() in order, tracking which stack outputs flow into each deploy_stack call."""
+    main = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == "main")
+    strings, taint, templates, stacks = {}, {}, {}, []
+    parameter_files = []
+
+    for stmt in main.body:
+        if isinstance(stmt, ast.Assign):
+            path = resolve_path(stmt.value, strings)
+            upstream = sources(stmt.value, taint)
+            template_paths = find_paths(stmt.value, strings, (".yaml", ".yml"))
+            parameter_files.extend(p for p in find_paths(stmt.value, strings, (".json",)) if p not in parameter_files)
+            for target in stmt.targets:
+                key = target.id if isinstance(target, ast.Name) else subscript_key(target)
+                if not key:
+                    continue
+                if path is not None:
+                    strings[key] = path
+                taint[key] = upstream
+                if template_paths:
+                    templates[key] = template_paths[0]
+        elif isinstance(stmt, ast.Expr) and call_name(stmt.value) == "deploy_stack":
+            call = stmt.value
+            if not call.args or not isinstance(call.args[0], ast.Constant):
+                continue
+            template = None
+            if len(call.args) > 1:
+                arg = call.args[1]
+                template = templates.get(arg.id) if isinstance(arg, ast.Name) else None
+                template = template or next(iter(find_paths(arg, strings, (".yaml", ".yml"))), None)
+            upstream = set()
+            for arg in call.args[1:]:
+                upstream |= sources(arg, taint)
+            stacks.append({
+                "name": call.args[0].value,
+                "pipeline": pipeline,
+                "template": template,
+                "parameters": parameter_files[0] if parameter_files else None,
+                "depends_on": sorted(s for s in upstream if not s.startswith(PARAM_MARKER)),
+                "parameter_keys": sorted(s[len(PARAM_MARKER):] for s in upstream if s.startswith(PARAM_MARKER)),
+            })
+    return stacks
+
+
+def analyse_declarative(pipeline, tree):
+    """Read the STACKS list used by the perimeter and egress pipelines."""
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "STACKS" for t in node.targets):
+            stacks = []
+            for entry in node.value.elts:
+                fields = {
+                    k.value: resolve_path(v, {}) if not isinstance(v, ast.Constant) else v.value
+                    for k, v in zip(entry.keys, entry.values)
+                }
+                stacks.append({
+                    "name": fields["name"],
+                    "pipeline": pipeline,
+                    "template": fields.get("template"),
+                    "parameters": fields.get("parameters"),
+                    "depends_on": [],
+                    "parameter_keys": None,
+                })
+            return stacks
+    return []
+
+
+def load_pipeline(pipeline):
+    script = os.path.join(REPO_ROOT, pipeline, DEPLOY_SCRIPT)
+    with open(script, "r") as f:
+        tree = ast.parse(f.read(), filename=script)
+    has_main = any(isinstance(n, ast.FunctionDef) and n.name == "main" for n in tree.body)
+    stacks = analyse_procedural(pipeline, tree) if has_main else analyse_declarative(pipeline, tree)
+    for stack in stacks:
+        for key in ("template", "parameters"):
+            if stack[key]:
+                stack[key] = os.path.relpath(os.path.join(REPO_ROOT, pipeline, stack[key]), REPO_ROOT)
+    return stacks
+
+# ---------------------------
+# TEMPLATE AND PARAMETER WIRING
+# ---------------------------
+def read_parameters(path):
+    try:
+        with open(os.path.join(REPO_ROOT, path), "r") as f:
+            return {p["ParameterKey"]: p["ParameterValue"] for p in json.load(f)}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def clean_name(value):
+    value = value.strip()
+    for prefix in ("!Sub", "Fn::Sub:"):
+        if value.startswith(prefix):
+            value = value[len(prefix):].strip()
+    return value.strip("'\"")
+
+
+def scan_template(path):
+    """Return (export names, import names) declared in a template, unresolved."""
+    try:
+        with open(os.path.join(REPO_ROOT, path), "r") as f:
+            lines = [line.rstrip() for line in f]
+    except OSError:
+        return [], []
+
+    def following(i):
+        for line in lines[i + 1:]:
+            if line.strip() and not line.strip().startswith("#"):
+                return line
+        return ""
+
+    exports, imports = [], []
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped == "Export:":
+            name_line = following(i).strip()
+            if name_line.startswith("Name:"):
+                exports.append(clean_name(name_line[len("Name:"):]))
+        elif "ImportValue" in stripped:
+            rest = stripped.split("ImportValue", 1)[1].lstrip(":").strip()
+            imports.append(clean_name(rest or following(i)))
+    return exports, imports
+
+
+def resolve_sub(value, stack, params):
+    def replace(match):
+        name = match.group(1)
+        if name == "AWS::StackName":
+            return stack["name"]
+        return str(params.get(name, match.group(0)))
+    return SUB_VARIABLE.sub(replace, value)
+
+
+def build_graph(pipelines=None):
+    """Return stacks (in deploy order) keyed by name, each with its full depends_on list."""
+    stacks = {}
+    for pipeline in pipelines or PIPELINES:
+        for stack in load_pipeline(pipeline):
+            stacks[stack["name"]] = stack
+
+    exporters = {}
+    for stack in stacks.values():
+        params = read_parameters(stack["parameters"]) if stack["parameters"] else {}
+        stack["project"] = params.get("ProjectName")
+        exports, imports = scan_template(stack["template"]) if stack["template"] else ([], [])
+        stack["exports"] = [resolve_sub(e, stack, params) for e in exports]
+        stack["imports"] = [resolve_sub(i, stack, params) for i in imports]
+        for name in stack["exports"]:
+            exporters[name] = stack["name"]
+        for value in params.values():
+            for item in str(value).split(","):
+                if item.strip() in stacks and item.strip() != stack["name"]:
+                    stack["depends_on"].append(item.strip())
+
+    for stack in stacks.values():
+        stack["depends_on"].extend(exporters[i] for i in stack["imports"] if i in exporters)
+        stack["depends_on"] = sorted(set(d for d in stack["depends_on"] if d != stack["name"]))
+    return stacks
+
+# ---------------------------
+# IMPACT
+# ---------------------------
+def changed_files(base):
+    output = subprocess.run(
+        ["git", "diff", "--name-only", base, "--"],
+        cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    untracked = subprocess.run(
+        ["git", "ls-files", "--others", "--exclude-standard"],
+        cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return sorted(set(output.split()) | set(untracked.split()))
+
+
+def changed_parameter_keys(path, base):
+    """Keys whose values differ from base, or None when the old file can't be read."""
+    if not base:
+        return None
+    try:
+        old = subprocess.run(
+            ["git", "show", f"{base}:{path}"],
+            cwd=REPO_ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        old_params = {p["ParameterKey"]: p["ParameterValue"] for p in json.loads(old)}
+    except (subprocess.CalledProcessError, ValueError, KeyError, TypeError):
+        return None
+    new_params = read_parameters(path)
+    return {k for k in set(old_params) | set(new_params) if old_params.get(k) != new_params.get(k)}
+
+
+def generated_templates(changed):
+    """Templates re-rendered because their spec or the generator changed."""
+    outputs = []
+    spec_root = os.path.join(REPO_ROOT, GENERATOR_DIR, SPEC_DIR)
+    generator = os.path.join(GENERATOR_DIR, GENERATOR_SCRIPT)
+    for name in sorted(os.listdir(spec_root)) if os.path.isdir(spec_root) else []:
+        spec_path = os.path.join(GENERATOR_DIR, SPEC_DIR, name)
+        if spec_path in changed or generator in changed:
+            try:
+                with open(os.path.join(REPO_ROOT, spec_path), "r") as f:
+                    outputs.append(os.path.join(GENERATOR_DIR, json.load(f)["output"]))
+            except (OSError, ValueError, KeyError):
+                continue
+    return outputs
+
+
+def directly_affected(stacks, changed, base=None):
+    changed = {os.path.normpath(p) for p in changed}
+    changed |= set(generated_templates(changed))
+    reasons = {}
+    for stack in stacks.values():
+        script = os.path.join(stack["pipeline"], DEPLOY_SCRIPT)
+        if script in changed:
+            reasons[stack["name"]] = f"{script} changed"
+        elif stack["template"] in changed:
+            reasons[stack["name"]] = f"{stack['template']} changed"
+        elif stack["parameters"] in changed:
+            keys = changed_parameter_keys(stack["parameters"], base)
+            if stack["parameter_keys"] is None or keys is None:
+                reasons[stack["name"]] = f"{stack['parameters']} changed"
+            elif keys & set(stack["parameter_keys"]):
+                reasons[stack["name"]] = f"{stack['parameters']} changed ({', '.join(sorted(keys & set(stack['parameter_keys'])))})"
+    return reasons
+
+
+def impacted(stacks, changed, base=None):
+    """Return {stack: reason} for changed stacks plus everything downstream of them."""
+    dependents = {name: [] for name in stacks}
+    for stack in stacks.values():
+        for upstream in stack["depends_on"]:
+            dependents.setdefault(upstream, []).append(stack["name"])
+
+    reasons = directly_affected(stacks, changed, base)
+    queue = deque(reasons)
+    while queue:
+        name = queue.popleft()
+        for dependent in dependents.get(name, []):
+            if dependent not in reasons:
+                reasons[dependent] = f"depends on {name}"
+                queue.append(dependent)
+    return reasons
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the minimal set of stacks affected by a change.")
+    parser.add_argument("files", nargs="*", help="Changed files relative to the repo root (default: git diff against --base)")
+    parser.add_argument("--base", default="HEAD", help="Git ref to diff against when no files are given")
+    parser.add_argument("--graph", action="store_true", help="Print the stack dependency graph and exit")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    args = parser.parse_args()
+
+    graph = build_graph()
+    if args.graph:
+        if args.json:
+            print(json.dumps(graph, indent=2))
+        else:
+            for stack in graph.values():
+                print(f"{stack['name']} ({stack['pipeline']}) <- {', '.join(stack['depends_on']) or '-'}")
+        sys.exit(0)
+
+    try:
+        files = args.files or changed_files(args.base)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[FAILED] Could not list changed files: {e}")
+        sys.exit(1)
+    affected = impacted(graph, files, args.base)
+
+    by_pipeline = {}
+    for stack in graph.values():
+        if stack["name"] in affected:
+            by_pipeline.setdefault(stack["pipeline"], []).append(stack["name"])
+
+    if args.json:
+        print(json.dumps({"changed": files, "stacks": affected, "pipelines": by_pipeline}, indent=2))
+        sys.exit(0)
+    if not affected:
+        print("No stacks affected.")
+    for pipeline, names in by_pipeline.items():
+        print(f"\n{pipeline}:")
+        for name in names:
+            print(f"  {name}: {affected[name]}")
+        print(f"  deploy with: python {DEPLOY_SCRIPT} --stacks {','.join(names)}")
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+# ---------------------------
+# PATHS AND LAYERS
+# ---------------------------
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+OVERLAY_DIR = os.environ.get("CF_TENANT_OVERLAY_DIR", os.path.join(REPO_ROOT, "parameter_overlays"))
+CACHE_DIR = os.path.join(REPO_ROOT, ".parameter_cache")
+
+# Bump whenever merging or validation changes so cached bundles are not reused.
+COMPILER_VERSION = "1"
+
+# Overlays applied on top of a stack's own parameter file, lowest precedence
+# first. Global defaults sit below the stack file; the rest override it.
+DEFAULTS_LAYER = "global"
+OVERRIDE_LAYERS = [
+    ("environment", os.path.join("environments", "{environment}")),
+    ("region", os.path.join("regions", "{region}")),
+    ("tenant", os.path.join("tenants", "{tenant}")),
+]
+
+_digests = {}
+_documents = {}
+_bundles = {}
+
+
+def current_context(region=None):
+    """Environment, region and tenant for this run, taken from the process environment."""
+    return {
+        "environment": os.environ.get("CF_TENANT_ENVIRONMENT"),
+        "region": region or os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION"),
+        "tenant": os.environ.get("CF_TENANT"),
+    }
+
+# ---------------------------
+# INPUT FILES
+# ---------------------------
+def file_digest(path):
+    """Content hash of path, recomputed only when its size or mtime changes; None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _digests:
+        with open(path, "rb") as f:
+            _digests[key] = hashlib.sha256(f.read()).hexdigest()
+    return _digests[key]
+
+
+def read_json(path, digest):
+    if digest not in _documents:
+        with open(path, "r") as f:
+            _documents[digest] = json.load(f)
+    return _documents[digest]
+
+
+def parse_parameter_list(data, source):
+    """Validate a CloudFormation parameter list and return it as an ordered dict."""
+    if not isinstance(data, list):
+        raise ValueError(f"Parameter file must contain a JSON array: {source}")
+    params = {}
+    for p in data:
+        if not isinstance(p, dict) or "ParameterKey" not in p or "ParameterValue" not in p:
+            raise ValueError(f"Malformed parameter in {source}: {p}")
+        params[p["ParameterKey"]] = p["ParameterValue"]
+    return params
+
+
+def overlay_path(layer):
+    return os.path.join(OVERLAY_DIR, f"{layer}.json")
+
+
+def overlay_sections(path, digest, pipeline, stack):
+    """Return (shared, specific) values from one overlay file.
+
+    An overlay is a JSON object with optional "parameters" (every stack),
+    "pipelines" ({pipeline: values}) and "stacks" ({stack: values}) sections.
+    """
+    overlay = read_json(path, digest)
+    if not isinstance(overlay, dict):
+        raise ValueError(f"Overlay must be a JSON object: {path}")
+    shared = dict(overlay.get("parameters", {}))
+    shared.update(overlay.get("pipelines", {}).get(pipeline, {}) if pipeline else {})
+    specific = overlay.get("stacks", {}).get(stack, {}) if stack else {}
+    return shared, specific
+
+
+def template_parameters(template_path):
+    """Read the Parameters section of a YAML template: {name: {"default": bool, "allowed": list|None}}."""
+    declared, current, in_section, in_allowed = {}, None, False, False
+    with open(template_path, "r") as f:
+        lines = f.read().splitlines()
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if indent == 0:
+            in_section, current = stripped == "Parameters:", None
+            continue
+        if not in_section:
+            continue
+        if indent == 2 and stripped.endswith(":"):
+            current = declared.setdefault(stripped[:-1].strip("'\""), {"default": False, "allowed": None})
+            in_allowed = False
+        elif indent == 4 and current is not None:
+            key, _, value = stripped.partition(":")
+            value = value.strip()
+            in_allowed = key == "AllowedValues" and not value
+            if key == "Default":
+                current["default"] = True
+            elif key == "AllowedValues":
+                current["allowed"] = [v.strip().strip("'\"") for v in value.strip("[]").split(",") if v.strip()]
+        elif in_allowed and stripped.startswith("- "):
+            current["allowed"].append(stripped[2:].strip().strip("'\""))
+    return declared
+
+# ---------------------------
+# COMPILER
+# ---------------------------
+def input_files(parameters_path, template_path, context):
+    files = [("stack", parameters_path), ("template", template_path), (DEFAULTS_LAYER, overlay_path(DEFAULTS_LAYER))]
+    for name, pattern in OVERRIDE_LAYERS:
+        if context.get(name):
+            files.append((name, overlay_path(pattern.format(**context))))
+    return [(name, path, file_digest(path) if path else None) for name, path in files]
+
+
+def merge(files, pipeline, stack, stack_values=None):
+    """Merge every layer into one dict; returns (values, explicit_keys)."""
+    by_name = {name: (path, digest) for name, path, digest in files}
+    values, explicit = {}, set()
+
+    def apply(layer):
+        path, digest = by_name.get(layer, (None, None))
+        if digest is None:
+            return
+        shared, specific = overlay_sections(path, digest, pipeline, stack)
+        values.update(shared)
+        values.update(specific)
+        explicit.update(specific)
+
+    apply(DEFAULTS_LAYER)
+    path, digest = by_name["stack"]
+    if path:
+        if digest is None:
+            raise FileNotFoundError(f"Parameter file not found: {path}")
+        stack_values = parse_parameter_list(read_json(path, digest), path)
+    if stack_values:
+        values.update(stack_values)
+        explicit.update(stack_values)
+    for name, _ in OVERRIDE_LAYERS:
+        apply(name)
+    return values, explicit
+
+
+def validate(values, explicit, template_path, stack):
+    """Drop shared keys the template does not declare and check the rest against it."""
+    declared = template_parameters(template_path)
+    label = stack or os.path.basename(template_path)
+    problems = [f"{label}: '{key}' is not a parameter of {os.path.basename(template_path)}"
+                for key in sorted(explicit) if key not in declared]
+    values = {key: value for key, value in values.items() if key in declared}
+    for key, spec in declared.items():
+        if key not in values and not spec["default"]:
+            problems.append(f"{label}: required parameter '{key}' has no value in any layer")
+        elif key in values and spec["allowed"] and str(values[key]) not in spec["allowed"]:
+            problems.append(f"{label}: '{key}' = '{values[key]}' is not one of {', '.join(spec['allowed'])}")
+    if problems:
+        raise ValueError("Invalid parameters:\n  " + "\n  ".join(problems))
+    return values
+
+
+def compile_parameters(parameters_path=None, template_path=None, stack=None, pipeline=None, context=None,
+                       values=None):
+    """Return the merged CloudFormation parameter list for one stack.
+
+    values stands in for the stack's parameter file when a deploy script
+    computes them (the integration pipeline builds each stack's values
+    from earlier stack outputs).
+
+    Bundles are cached on disk under a hash of every input file's content,
+    the context and values, so only combinations whose inputs changed are
+    merged and validated again.
+    """
+    context = context if context is not None else current_context()
+    files = input_files(parameters_path, template_path, context)
+    key_material = json.dumps([COMPILER_VERSION, pipeline, stack, context, files, values])
+    digest = hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+    if digest in _bundles:
+        return [dict(p) for p in _bundles[digest]]
+
+    cache_path = os.path.join(CACHE_DIR, f"{digest}.json")
+    if os.path.isfile(cache_path):
+        with open(cache_path, "r") as f:
+            bundle = json.load(f)
+    else:
+        merged, explicit = merge(files, pipeline, stack, values)
+        if template_path:
+            merged = validate(merged, explicit, template_path, stack)
+        bundle = [{"ParameterKey": k, "ParameterValue": v} for k, v in merged.items()]
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(bundle, f, indent=2)
+    _bundles[digest] = bundle
+    return [dict(p) for p in bundle]
+
+
+def as_dict(bundle):
+    return {p["ParameterKey"]: p["ParameterValue"] for p in bundle}
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a stack parameter bundle from its file and overlays.")
+    parser.add_argument("parameters", nargs="?", help="The stack's own parameter file")
+    parser.add_argument("--template", help="Template to validate against and filter shared keys by")
+    parser.add_argument("--stack", help="Stack name, for stack-specific overlay sections")
+    parser.add_argument("--pipeline", help="Pipeline name (integration, perimeter, egress)")
+    parser.add_argument("--environment", help="Environment overlay (default: $CF_TENANT_ENVIRONMENT)")
+    parser.add_argument("--region", help="Region overlay (default: $AWS_REGION or $AWS_DEFAULT_REGION)")
+    parser.add_argument("--tenant", help="Tenant overlay (default: $CF_TENANT)")
+    args = parser.parse_args()
+
+    ctx = current_context(args.region)
+    ctx.update({k: v for k, v in (("environment", args.environment), ("tenant", args.tenant)) if v})
+    try:
+        print(json.dumps(compile_parameters(args.parameters, args.template, args.stack, args.pipeline, ctx), indent=2))
+    except (OSError, ValueError) as e:
+        print(f"[FAILED] {e}")
+        sys.exit(1)
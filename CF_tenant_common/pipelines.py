@@ -0,0 +1,25 @@
+import os
+
+# ---------------------------
+# PIPELINES
+# ---------------------------
+# Directory (relative to the repo root), deploy script and cleanup script of
+# each pipeline. Kept free of imports so the inventory and the deployment
+# service can share it without loading each other.
+PIPELINES = {
+    "integration": {
+        "dir": "CF_tenant_integration_setup",
+        "deploy": "deployment.py",
+        "cleanup": "cleanup.py",
+    },
+    "perimeter": {
+        "dir": os.path.join("CF_tenant_perimeter_setup", "perimeter_security_setup"),
+        "deploy": "deployment.py",
+        "cleanup": "cleanup_stacks.py",
+    },
+    "egress": {
+        "dir": os.path.join("CF_tenant_perimeter_setup", "egress_security_setup"),
+        "deploy": "deployment.py",
+        "cleanup": "cleanup_stack.py",
+    },
+}
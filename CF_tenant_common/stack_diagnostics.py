@@ -0,0 +1,145 @@
+import argparse
+import re
+import sys
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+# ---------------------------
+# EVENT CLASSIFICATION
+# ---------------------------
+OPERATION_START_STATUSES = {
+    "CREATE_IN_PROGRESS",
+    "UPDATE_IN_PROGRESS",
+    "DELETE_IN_PROGRESS",
+    "IMPORT_IN_PROGRESS",
+}
+FAILURE_SUMMARY_STATUSES = {
+    "ROLLBACK_IN_PROGRESS",
+    "UPDATE_ROLLBACK_IN_PROGRESS",
+    "IMPORT_ROLLBACK_IN_PROGRESS",
+    "CREATE_FAILED",
+    "UPDATE_FAILED",
+    "DELETE_FAILED",
+}
+# Reasons CloudFormation gives resources it stopped because something else failed.
+SECONDARY_REASONS = (
+    "Resource creation cancelled",
+    "Resource update cancelled",
+    "Resource deletion cancelled",
+)
+RESOURCE_LIST = re.compile(r"\[([^\]]+)\]")
+NESTED_STACK_TYPE = "AWS::CloudFormation::Stack"
+MAX_NESTING = 5
+
+
+def is_stack_event(event):
+    return event["LogicalResourceId"] == event["StackName"] and event["ResourceType"] == NESTED_STACK_TYPE
+
+
+def is_secondary(event):
+    return event.get("ResourceStatusReason", "").startswith(SECONDARY_REASONS)
+
+# ---------------------------
+# EVENT STREAM
+# ---------------------------
+def iter_stack_events(cf, stack_name):
+    """Yield stack events newest-first, fetching further pages only when needed."""
+    paginator = cf.get_paginator("describe_stack_events")
+    for page in paginator.paginate(StackName=stack_name):
+        for event in page["StackEvents"]:
+            yield event
+
+
+def find_failures(cf, stack_name):
+    """Scan the current operation newest-first and return its triggering *_FAILED events.
+
+    The stack-level rollback/failed event names the resources that caused it,
+    so scanning stops as soon as all of them are found, or at the event that
+    started the operation.
+    """
+    failures, listed, expected, scanned = [], None, None, 0
+    for event in iter_stack_events(cf, stack_name):
+        scanned += 1
+        status = event["ResourceStatus"]
+        if is_stack_event(event):
+            if status in FAILURE_SUMMARY_STATUSES and expected is None:
+                match = RESOURCE_LIST.search(event.get("ResourceStatusReason", ""))
+                if match:
+                    listed = {name.strip() for name in match.group(1).split(",")}
+                    expected = set(listed)
+            elif status in OPERATION_START_STATUSES:
+                break
+            continue
+        if status.endswith("_FAILED") and not is_secondary(event):
+            failures.append(event)
+            if expected is not None and event["LogicalResourceId"] in expected:
+                expected.discard(event["LogicalResourceId"])
+                if not expected:
+                    break
+
+    triggering = [e for e in failures if listed and e["LogicalResourceId"] in listed]
+    # Without a usable summary event, the oldest failure in the operation is the trigger.
+    if not triggering and failures:
+        triggering = [failures[-1]]
+    return triggering, scanned
+
+
+def diagnose(cf, stack_name, path=None, depth=0):
+    """Return root causes as dicts, following failed nested stacks down to the resource."""
+    path = (path or []) + [stack_name]
+    failures, _ = find_failures(cf, stack_name)
+    causes = []
+    for event in reversed(failures):
+        nested_id = event.get("PhysicalResourceId")
+        if event["ResourceType"] == NESTED_STACK_TYPE and nested_id and depth < MAX_NESTING:
+            nested = diagnose(cf, nested_id, path, depth + 1)
+            if nested:
+                causes.extend(nested)
+                continue
+        causes.append({
+            "stack": event["StackName"],
+            "path": [p.split("/")[1] if p.startswith("arn:") else p for p in path],
+            "resource": event["LogicalResourceId"],
+            "physical_id": event.get("PhysicalResourceId", ""),
+            "type": event["ResourceType"],
+            "status": event["ResourceStatus"],
+            "reason": event.get("ResourceStatusReason", ""),
+            "timestamp": event["Timestamp"],
+        })
+    return causes
+
+
+def format_root_causes(stack_name, causes):
+    if not causes:
+        return [f"No failed resource events found for the current operation of '{stack_name}'."]
+    lines = [f"Root cause for stack '{stack_name}':"]
+    for cause in causes:
+        lines.append(f"  {' > '.join(cause['path'])} > {cause['resource']} ({cause['type']}) {cause['status']} at {cause['timestamp']}")
+        lines.append(f"    {cause['reason']}")
+    return lines
+
+
+def report_failure(cf, stack_name, log=print):
+    """Diagnose stack_name and emit the root cause through log; never raises."""
+    try:
+        causes = diagnose(cf, stack_name)
+    except (BotoCoreError, ClientError) as e:
+        log(f"Could not retrieve stack events for '{stack_name}': {e}")
+        return []
+    for line in format_root_causes(stack_name, causes):
+        log(line)
+    return causes
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the root-cause failure of a CloudFormation stack operation.")
+    parser.add_argument("stacks", nargs="+", help="Stack names or IDs to diagnose")
+    parser.add_argument("--region", help="AWS region (default: from the environment)")
+    args = parser.parse_args()
+
+    client = boto3.client("cloudformation", region_name=args.region)
+    found = [report_failure(client, name) for name in args.stacks]
+    sys.exit(0 if all(found) else 1)
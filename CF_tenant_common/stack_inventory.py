@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from CF_tenant_common import deployment_history, impact_analysis, pipelines  # noqa: E402
+
+# ---------------------------
+# SETTINGS
+# ---------------------------
+CACHE_DIR = os.path.join(REPO_ROOT, ".stack_inventory")
+INDEX_VERSION = 1
+
+TAG_PIPELINE = "cf-tenant:pipeline"
+TAG_TENANT = "cf-tenant:tenant"
+TAG_PROJECT = "cf-tenant:project"
+
+# Above this many new or changed stacks, one paginated describe_stacks sweep
+# is cheaper than describing each of them by name.
+MAX_SINGLE_DESCRIBES = 20
+DRIFT_POLL_INTERVAL = 5
+DRIFT_TIMEOUT = 600
+
+
+def stack_tags(pipeline, parameters=None):
+    """Tags that place a stack in the inventory; pass them to create_stack and update_stack."""
+    project = deployment_history.tenant_from_parameters(parameters)
+    values = {
+        TAG_PIPELINE: pipeline,
+        TAG_TENANT: os.environ.get("CF_TENANT") or project,
+        TAG_PROJECT: project,
+    }
+    return [{"Key": key, "Value": value} for key, value in values.items() if value]
+
+
+def declared_stacks(pipeline):
+    """Names of the stacks a pipeline's deploy script creates, in deploy order."""
+    return [stack["name"] for stack in impact_analysis.load_pipeline(pipelines.PIPELINES[pipeline]["dir"])]
+
+
+def known_stacks():
+    """{stack name: pipeline} for every stack a deploy script creates, for stacks deployed before tagging."""
+    names = {}
+    for pipeline in pipelines.PIPELINES:
+        for name in declared_stacks(pipeline):
+            names.setdefault(name, pipeline)
+    return names
+
+# ---------------------------
+# INDEX
+# ---------------------------
+def index_path(region, profile=None):
+    profile = profile or os.environ.get("AWS_PROFILE") or "default"
+    return os.path.join(CACHE_DIR, f"{profile}-{region}.json")
+
+
+def empty_index(region):
+    return {"version": INDEX_VERSION, "region": region, "swept_at": None, "stacks": {}}
+
+
+def load_index(region, profile=None):
+    path = index_path(region, profile)
+    try:
+        with open(path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return empty_index(region)
+    if index.get("version") != INDEX_VERSION:
+        return empty_index(region)
+    return index
+
+
+def save_index(index, profile=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = index_path(index["region"], profile)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def fingerprint(summary):
+    changed = summary.get("LastUpdatedTime") or summary["CreationTime"]
+    return f"{summary['StackId']}|{summary['StackStatus']}|{changed.isoformat()}"
+
+
+def make_entry(stack, known, summary):
+    """Index record for one describe_stacks result and its list_stacks summary."""
+    tags = {t["Key"]: t["Value"] for t in stack.get("Tags", [])}
+    project = tags.get(TAG_PROJECT) or deployment_history.tenant_from_parameters(stack.get("Parameters"))
+    return {
+        "name": stack["StackName"],
+        "id": stack["StackId"],
+        "status": stack["StackStatus"],
+        "created": stack["CreationTime"].isoformat(),
+        "updated": (stack.get("LastUpdatedTime") or stack["CreationTime"]).isoformat(),
+        "pipeline": tags.get(TAG_PIPELINE) or known.get(stack["StackName"]),
+        # Untagged stacks predate the inventory tags; they match any tenant.
+        "tenant": tags.get(TAG_TENANT),
+        "project": project,
+        "tagged": TAG_PIPELINE in tags,
+        "fingerprint": fingerprint(summary),
+    }
+
+# ---------------------------
+# SWEEP
+# ---------------------------
+def list_summaries(cf):
+    """{name: summary} for every live top-level stack, from one paginated list_stacks sweep."""
+    summaries = {}
+    for page in cf.get_paginator("list_stacks").paginate():
+        for summary in page["StackSummaries"]:
+            if summary["StackStatus"] == "DELETE_COMPLETE" or summary.get("ParentId"):
+                continue
+            summaries[summary["StackName"]] = summary
+    return summaries
+
+
+def describe_all(cf):
+    stacks = {}
+    for page in cf.get_paginator("describe_stacks").paginate():
+        for stack in page["Stacks"]:
+            stacks[stack["StackName"]] = stack
+    return stacks
+
+
+def describe_some(cf, names):
+    stacks = {}
+    for name in names:
+        try:
+            stacks[name] = cf.describe_stacks(StackName=name)["Stacks"][0]
+        except ClientError as e:
+            # Deleted between the two calls; the next sweep drops it.
+            if "does not exist" not in str(e):
+                raise
+    return stacks
+
+
+def refresh(cf, index=None, full=False, known=None):
+    """Bring the index up to date and return it.
+
+    list_stacks runs on every refresh; describe_stacks only covers stacks
+    whose id, status or last change differ from the cached entry, or every
+    stack when full is set or too many changed for single calls.
+    """
+    index = index or empty_index(cf.meta.region_name)
+    known = known if known is not None else known_stacks()
+    summaries = list_summaries(cf)
+    cached = index["stacks"]
+    changed = [name for name, summary in summaries.items()
+               if full or name not in cached or cached[name].get("fingerprint") != fingerprint(summary)]
+
+    if changed:
+        described = describe_all(cf) if full or len(changed) > MAX_SINGLE_DESCRIBES else describe_some(cf, changed)
+        for name in changed:
+            if name in described:
+                cached[name] = make_entry(described[name], known, summaries[name])
+    for name in [name for name in cached if name not in summaries]:
+        del cached[name]
+
+    index["swept_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    return index
+
+
+def inventory(cf, full=False, max_age=0, profile=None):
+    """Cached index for cf's region, refreshed unless the last sweep is newer than max_age seconds."""
+    index = load_index(cf.meta.region_name, profile)
+    if not full and index["swept_at"] and max_age:
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(index["swept_at"])
+        if age.total_seconds() < max_age:
+            return index
+    index = refresh(cf, index, full)
+    save_index(index, profile)
+    return index
+
+
+def query(index, pipeline=None, tenant=None, project=None, names=None):
+    """Matching entries, most recently created first."""
+    entries = [
+        entry for entry in index["stacks"].values()
+        if (not pipeline or entry["pipeline"] == pipeline)
+        and (not tenant or entry["tenant"] in (tenant, None))
+        and (not project or entry["project"] == project)
+        and (not names or entry["name"] in names)
+    ]
+    return sorted(entries, key=lambda e: e["created"], reverse=True)
+
+
+def pipeline_stacks(cf, pipeline, tenant=None):
+    """Names of the live stacks of one pipeline, in deletion order.
+
+    Stacks hand outputs to each other as parameters, not imports, so
+    CloudFormation cannot see the dependencies and creation times say
+    nothing about them (an upstream stack may have been recreated last).
+    Declared stacks are therefore deleted in reverse deploy order; the
+    inventory only decides which of them are live. Tagged stacks the deploy
+    script no longer declares go first, newest first.
+    """
+    tenant = tenant or os.environ.get("CF_TENANT")
+    live = [entry["name"] for entry in query(inventory(cf), pipeline=pipeline, tenant=tenant)]
+    declared = declared_stacks(pipeline)
+    return [name for name in live if name not in declared] + [name for name in reversed(declared) if name in live]
+
+# ---------------------------
+# DRIFT
+# ---------------------------
+def detect_drift(cf, names, log=print):
+    """Run drift detection on the stacks at once and return {name: drift status or error}."""
+    detections, results = {}, {}
+    for name in names:
+        try:
+            detections[name] = cf.detect_stack_drift(StackName=name)["StackDriftDetectionId"]
+        except ClientError as e:
+            results[name] = f"ERROR: {e}"
+
+    deadline = time.time() + DRIFT_TIMEOUT
+    while detections and time.time() < deadline:
+        time.sleep(DRIFT_POLL_INTERVAL)
+        for name, detection_id in list(detections.items()):
+            status = cf.describe_stack_drift_detection_status(StackDriftDetectionId=detection_id)
+            if status["DetectionStatus"] == "DETECTION_IN_PROGRESS":
+                continue
+            del detections[name]
+            if status["DetectionStatus"] == "DETECTION_FAILED":
+                results[name] = f"ERROR: {status.get('DetectionStatusReason', 'detection failed')}"
+            else:
+                results[name] = status["StackDriftStatus"]
+            log(f"[DRIFT] {name}: {results[name]}")
+    for name in detections:
+        results[name] = "ERROR: timed out"
+    return results
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+def print_table(entries):
+    print(f"{'STACK':<32} {'PIPELINE':<12} {'TENANT':<20} {'STATUS':<32} UPDATED")
+    for e in entries:
+        flag = "" if e["tagged"] else " (untagged)"
+        print(f"{e['name'][:32]:<32} {(e['pipeline'] or '-'):<12} {(e['tenant'] or '-')[:20]:<20} "
+              f"{e['status']:<32} {e['updated'][:19]}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag-indexed inventory of the tenant CloudFormation stacks.")
+    parser.add_argument("command", nargs="?", choices=["list", "drift"], default="list")
+    parser.add_argument("--pipeline", help="Only stacks of this pipeline (integration, perimeter, egress)")
+    parser.add_argument("--tenant", help="Only stacks of this tenant")
+    parser.add_argument("--project", help="Only stacks with this ProjectName")
+    parser.add_argument("--stacks", help="Comma-separated stack names to restrict to")
+    parser.add_argument("--region", help="AWS region (default: from the environment)")
+    parser.add_argument("--full", action="store_true", help="Describe every stack instead of only changed ones")
+    parser.add_argument("--max-age", type=int, default=60, help="Reuse the cached index if swept this recently")
+    parser.add_argument("--json", action="store_true", help="Print the matching entries as JSON")
+    args = parser.parse_args()
+
+    client = boto3.client("cloudformation", region_name=args.region)
+    names = {n.strip() for n in args.stacks.split(",") if n.strip()} if args.stacks else None
+    try:
+        index = inventory(client, full=args.full, max_age=args.max_age)
+        entries = query(index, args.pipeline, args.tenant, args.project, names)
+        if args.command == "drift":
+            results = detect_drift(client, [e["name"] for e in entries])
+            for entry in entries:
+                entry["drift"] = results.get(entry["name"])
+    except (BotoCoreError, ClientError) as e:
+        print(f"[FAILED] {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    elif args.command == "list":
+        print_table(entries)
+    if args.command == "drift" and any(e["drift"] != "IN_SYNC" for e in entries):
+        sys.exit(1)
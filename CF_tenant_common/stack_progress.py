@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from CF_tenant_common import stack_diagnostics  # noqa: E402
+
+# ---------------------------
+# SETTINGS
+# ---------------------------
+REFRESH_INTERVAL = 5
+IN_PROGRESS_STATUSES = [
+    "CREATE_IN_PROGRESS",
+    "UPDATE_IN_PROGRESS",
+    "UPDATE_COMPLETE_CLEANUP_IN_PROGRESS",
+    "UPDATE_ROLLBACK_IN_PROGRESS",
+    "UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS",
+    "ROLLBACK_IN_PROGRESS",
+    "DELETE_IN_PROGRESS",
+    "IMPORT_IN_PROGRESS",
+    "REVIEW_IN_PROGRESS",
+]
+DONE_SUFFIXES = ("_COMPLETE", "_SKIPPED")
+
+
+def count_resources(template_body):
+    """Number of top-level resources in a JSON (already parsed) or YAML template body."""
+    if isinstance(template_body, dict):
+        return len(template_body.get("Resources", {}))
+    count, in_resources = 0, False
+    for line in template_body.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if indent == 0:
+            in_resources = line.strip() == "Resources:"
+        elif in_resources and indent == 2 and line.rstrip().endswith(":"):
+            count += 1
+    return count
+
+# ---------------------------
+# STACK WATCH
+# ---------------------------
+class StackWatch:
+    """Follows one stack's current operation through its events, fetching only new ones."""
+
+    def __init__(self, cf, stack_name, template_body=None):
+        self.cf = cf
+        self.stack_name = stack_name
+        self.started_at = time.time()
+        self.status = None
+        self.total = count_resources(template_body) if template_body else None
+        self.resources = {}
+        self.last_event = None
+        self._seen = set()
+
+    def _new_events(self):
+        """Events newer than the last refresh, oldest first, stopping at the operation start."""
+        fresh = []
+        for event in stack_diagnostics.iter_stack_events(self.cf, self.stack_name):
+            if event["EventId"] in self._seen:
+                break
+            fresh.append(event)
+            if (stack_diagnostics.is_stack_event(event)
+                    and event["ResourceStatus"] in stack_diagnostics.OPERATION_START_STATUSES):
+                self.started_at = event["Timestamp"].timestamp()
+                break
+        return list(reversed(fresh))
+
+    def _template_total(self):
+        try:
+            body = self.cf.get_template(StackName=self.stack_name, TemplateStage="Processed")["TemplateBody"]
+            return count_resources(body)
+        except (BotoCoreError, ClientError):
+            return None
+
+    def refresh(self, status=None):
+        """Pull new events (and the stack status unless given); returns the current row."""
+        if status is None:
+            status = self.cf.describe_stacks(StackName=self.stack_name)["Stacks"][0]["StackStatus"]
+        self.status = status
+        try:
+            events = self._new_events()
+        except (BotoCoreError, ClientError):
+            # Progress is cosmetic; keep the previous row rather than failing the caller.
+            events = []
+        for event in events:
+            self._seen.add(event["EventId"])
+            if stack_diagnostics.is_stack_event(event):
+                continue
+            self.resources[event["LogicalResourceId"]] = event["ResourceStatus"]
+            self.last_event = event
+        if self.total is None and not status.startswith("UPDATE"):
+            self.total = self._template_total()
+        return self.row()
+
+    @property
+    def finished(self):
+        return self.status is not None and not self.status.endswith("_IN_PROGRESS")
+
+    def row(self):
+        now = time.time()
+        last = None
+        if self.last_event:
+            last = {
+                "resource": self.last_event["LogicalResourceId"],
+                "status": self.last_event["ResourceStatus"],
+                "reason": self.last_event.get("ResourceStatusReason", ""),
+                "age": int(now - self.last_event["Timestamp"].timestamp()),
+            }
+        return {
+            "stack": self.stack_name,
+            "status": self.status,
+            "elapsed": int(now - self.started_at),
+            "completed": sum(1 for s in self.resources.values() if s.endswith(DONE_SUFFIXES)),
+            # Updates only touch some resources, so their total is what has been touched so far.
+            "total": self.total if self.total is not None else len(self.resources),
+            "last_event": last,
+        }
+
+# ---------------------------
+# BOARD
+# ---------------------------
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class ProgressBoard:
+    """One row per in-flight stack, redrawn in place on a TTY, JSON lines otherwise.
+
+    In JSON mode a line is written only when a row changes, ignoring the
+    elapsed clocks, so parallel runs produce one record per real event.
+
+    on_status(stack, status) is called whenever a stack's status changes,
+    with the live rows cleared first, so a script can keep writing status
+    lines to its log and the same terminal. Create one board per run and
+    pass it to every wait loop, so stacks in flight together share it.
+    """
+
+    HEADER = f"{'STACK':<28} {'STATUS':<36} {'ELAPSED':>8} {'RESOURCES':>9}  LAST EVENT"
+
+    def __init__(self, stream=None, json_lines=None, on_status=None):
+        self.stream = stream or sys.stdout
+        self.tty = not json_lines if json_lines is not None else hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.on_status = on_status
+        self.rows = {}
+        self._drawn = 0
+        self._emitted = {}
+        self._statuses = {}
+
+    def update(self, row):
+        if self.on_status and self._statuses.get(row["stack"]) != row["status"]:
+            self._statuses[row["stack"]] = row["status"]
+            if self.tty:
+                self.clear()
+            self.on_status(row["stack"], row["status"])
+        self.rows[row["stack"]] = row
+        if self.tty:
+            self.redraw()
+        else:
+            self.emit(row)
+
+    def finish(self, stack_name):
+        """Drop a stack from the live rows, leaving its final state printed above them."""
+        row = self.rows.pop(stack_name, None)
+        self._statuses.pop(stack_name, None)
+        if row is None:
+            return
+        if self.tty:
+            self.clear()
+            self.stream.write(self.format_row(row) + "\n")
+            self.redraw()
+        else:
+            self.emit(row)
+            self._emitted.pop(stack_name, None)
+
+    def emit(self, row):
+        last = row["last_event"] or {}
+        key = (row["status"], row["completed"], row["total"], last.get("resource"), last.get("status"), last.get("reason"))
+        if self._emitted.get(row["stack"]) == key:
+            return
+        self._emitted[row["stack"]] = key
+        record = dict(row, time=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        self.stream.write(json.dumps(record, default=str) + "\n")
+        self.stream.flush()
+
+    @staticmethod
+    def format_row(row):
+        last = row["last_event"]
+        event = f"{last['resource']} {last['status']} ({format_duration(last['age'])} ago)" if last else "-"
+        progress = f"{row['completed']}/{row['total'] if row['total'] is not None else '?'}"
+        return f"{row['stack'][:28]:<28} {(row['status'] or '-')[:36]:<36} {format_duration(row['elapsed']):>8} {progress:>9}  {event}"
+
+    def clear(self):
+        if self._drawn:
+            self.stream.write(f"\x1b[{self._drawn}F\x1b[J")
+            self._drawn = 0
+
+    def redraw(self):
+        self.clear()
+        if not self.rows:
+            self.stream.flush()
+            return
+        # Oldest operation first: the top row is the one holding up a rollout.
+        lines = [self.HEADER] + [self.format_row(r) for r in sorted(self.rows.values(), key=lambda r: -r["elapsed"])]
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+        self._drawn = len(lines)
+
+# ---------------------------
+# ACCOUNT-WIDE WATCHER
+# ---------------------------
+def in_progress_stacks(cf, prefix=None):
+    names = []
+    for page in cf.get_paginator("list_stacks").paginate(StackStatusFilter=IN_PROGRESS_STATUSES):
+        for summary in page["StackSummaries"]:
+            if summary.get("ParentId"):
+                continue
+            if not prefix or summary["StackName"].startswith(prefix):
+                names.append(summary["StackName"])
+    return names
+
+
+def watch(cf, board, names=None, prefix=None, interval=REFRESH_INTERVAL):
+    """Follow the given stacks, or every in-flight stack, on one board until none is in progress."""
+    # Named stacks are followed once; discovered ones again if a new operation starts.
+    pending = list(names) if names else None
+    watches = {}
+    while True:
+        for name in pending if pending is not None else in_progress_stacks(cf, prefix):
+            if name not in watches:
+                watches[name] = StackWatch(cf, name)
+        for name, stack in list(watches.items()):
+            try:
+                board.update(stack.refresh())
+            except ClientError as e:
+                if "does not exist" not in str(e):
+                    raise
+                stack.status = "DELETE_COMPLETE"
+            if stack.finished:
+                board.finish(name)
+                del watches[name]
+                if pending is not None:
+                    pending.remove(name)
+        if not watches:
+            return
+        time.sleep(interval)
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live view of in-flight CloudFormation stack operations.")
+    parser.add_argument("stacks", nargs="*", help="Stacks to follow (default: every stack in progress)")
+    parser.add_argument("--prefix", help="Only pick up in-progress stacks whose name starts with this")
+    parser.add_argument("--region", help="AWS region (default: from the environment)")
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="Seconds between refreshes")
+    parser.add_argument("--json", action="store_true", help="Write JSON lines even on a terminal")
+    args = parser.parse_args()
+
+    client = boto3.client("cloudformation", region_name=args.region)
+    try:
+        watch(client, ProgressBoard(json_lines=args.json or None), args.stacks, args.prefix, args.interval)
+    except KeyboardInterrupt:
+        pass
+    except (BotoCoreError, ClientError) as e:
+        print(f"[FAILED] {e}")
+        sys.exit(1)
@@ -1,31 +1,26 @@
 import boto3
+import os
 import sys
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, WaiterError
 
-cf = boto3.client('cloudformation')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+from CF_tenant_common import delete_recovery, dependency_drain, deployment_history, stack_inventory
 
-def stack_exists(stack_name):
-    try:
-        cf.describe_stacks(StackName=stack_name)
-        return True
-    except ClientError as e:
-        if "does not exist" in str(e):
-            return False
-        else:
-            print(f"Error checking stack existence: {e}")
-            sys.exit(1)
+cf = boto3.client('cloudformation')
 
 def delete_stack(stack_name):
-    if stack_exists(stack_name):
-        print(f"Deleting stack '{stack_name}'...")
+    print(f"Deleting stack '{stack_name}'...")
+    with deployment_history.track(stack_name, "delete", region=cf.meta.region_name) as run:
+        run["polls"] = None  # the boto3 waiter does not expose its poll count
+        dependency_drain.drain_stack(cf, stack_name)
         try:
             cf.delete_stack(StackName=stack_name)
             wait_for_stack_delete(stack_name)
+        except delete_recovery.DeleteFailed:
+            recover_stack_delete(stack_name, run)
         except ClientError as e:
             print(f"Failed to delete stack {stack_name}: {e}")
             sys.exit(1)
-    else:
-        print(f"Stack '{stack_name}' does not exist. Skipping...")
 
 def wait_for_stack_delete(stack_name):
     print(f"Waiting for stack '{stack_name}' deletion to complete...")
@@ -33,29 +28,42 @@ def wait_for_stack_delete(stack_name):
     try:
         waiter.wait(StackName=stack_name)
         print(f"Stack '{stack_name}' deleted successfully.")
+    except WaiterError as e:
+        stacks = (e.last_response or {}).get('Stacks') or [{}]
+        if stacks[0].get('StackStatus') == 'DELETE_FAILED':
+            raise delete_recovery.DeleteFailed(stack_name)
+        print(f"Error waiting for stack deletion: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error waiting for stack deletion: {e}")
         sys.exit(1)
 
+def recover_stack_delete(stack_name, run):
+    print(f"Stack '{stack_name}' reached DELETE_FAILED; recovering...")
+    try:
+        retained = delete_recovery.recover(cf, stack_name, lambda: wait_for_stack_delete(stack_name))
+    except (delete_recovery.DeleteFailed, ClientError) as e:
+        print(f"Failed to delete stack {stack_name}: {e}")
+        sys.exit(1)
+    if retained:
+        run["outcome"] = "RETAINED"
+    delete_recovery.report_retained(stack_name, retained)
+
 def main():
-    stacks_to_delete = [
-        "SFTPStack",
-        "ApiGatewayVpcEndpointStack",
-        "ALBStack",
-        "RouteTablesStack",
-        "SubnetStack",
-        "WAFStack",
-        "Route53Stack",
-        "IgwStack",
-        "VgwStack",
-        "SecurityGroupsStack",
-        "VpcStack"
-    ]
+    try:
+        # Live integration stacks from the inventory, in reverse deployment order.
+        stacks_to_delete = stack_inventory.pipeline_stacks(cf, "integration")
+    except ClientError as e:
+        print(f"Failed to list stacks: {e}")
+        sys.exit(1)
+    if not stacks_to_delete:
+        print("No integration stacks found.")
+        return
 
     for stack_name in stacks_to_delete:
         delete_stack(stack_name)
 
-    print("All specified stacks have been deleted successfully.")
+    print("All integration stacks have been deleted successfully.")
 
 if __name__ == "__main__":
     main()
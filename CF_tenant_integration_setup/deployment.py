@@ -1,24 +1,49 @@
+import argparse
 import boto3
 import json
 import os
 import sys
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+from CF_tenant_common import (
+    cidr_planner, deployment_history, impact_analysis, parameter_compiler, stack_diagnostics, stack_inventory,
+)
+
 cf = boto3.client('cloudformation')
 acm = boto3.client('acm')
 
+# Populated from --stacks; when empty every stack is deployed.
+ONLY_STACKS = set()
+
+# Parameter files written before the VPC endpoints stack have no
+# EndpointSubnetCidrs; the deploy stops and suggests one block of this size
+# per AZ from the free space of VpcCidr for the operator to pin.
+ENDPOINT_SUBNET_PREFIX = 26
+ENDPOINT_SUBNET_COUNT = 3
+
+# ALB and target group settings passed through when the parameters set them;
+# alb.yaml supplies the defaults for the rest.
+ALB_TUNING_KEYS = [
+    "TargetType", "LoadBalancingAlgorithm", "SlowStartDuration", "DeregistrationDelay",
+    "StickinessEnabled", "StickinessDuration", "CrossZoneLoadBalancing", "IdleTimeout", "Http2Enabled",
+]
+
 def load_parameters(file_path):
     print(f"Loading parameters from: {file_path}")
     try:
-        with open(file_path, 'r') as f:
-            params_list = json.load(f)
-        return {param['ParameterKey']: param['ParameterValue'] for param in params_list}
+        return parameter_compiler.as_dict(parameter_compiler.compile_parameters(
+            file_path, pipeline="integration", context=parameter_compiler.current_context(cf.meta.region_name)
+        ))
     except FileNotFoundError:
         print(f"Parameter file '{file_path}' not found. Skipping.")
         return {}
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from '{file_path}': {e}")
         sys.exit(1)
+    except ValueError as e:
+        print(f"Invalid parameters in '{file_path}': {e}")
+        sys.exit(1)
 
 def format_parameters(params_dict):
     formatted = []
@@ -57,39 +82,72 @@ def stack_exists(stack_name):
             print(f"Error checking stack existence: {e}")
             sys.exit(1)
 
-def deploy_stack(stack_name, template_body, parameters):
+def selected_stacks(only):
+    """Names from a --stacks value, checked against the stacks main() deploys."""
+    names = {name.strip() for name in only.split(",") if name.strip()}
+    pipeline = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+    unknown = names - {stack["name"] for stack in impact_analysis.load_pipeline(pipeline)}
+    if unknown:
+        raise ValueError(f"Unknown stacks requested: {', '.join(sorted(unknown))}")
+    return names
+
+def stack_parameters(stack_name, template_path, values):
+    """Apply the stack's own overlay sections to values and check them against its template."""
+    try:
+        return parameter_compiler.as_dict(parameter_compiler.compile_parameters(
+            template_path=template_path, stack=stack_name, pipeline="integration", values=values,
+            context=parameter_compiler.current_context(cf.meta.region_name),
+        ))
+    except ValueError as e:
+        print(f"Invalid parameters for stack '{stack_name}': {e}")
+        sys.exit(1)
+
+def deploy_stack(stack_name, template_path, parameters):
+    if ONLY_STACKS and stack_name not in ONLY_STACKS:
+        print(f"Skipping stack '{stack_name}' (not selected); reusing its existing outputs.\n")
+        return
+    template_body = read_template_file(template_path)
+    parameters = stack_parameters(stack_name, template_path, parameters)
     params = format_parameters(parameters)
-    if stack_exists(stack_name):
-        print(f"Updating stack: {stack_name}")
-        try:
-            cf.update_stack(
-                StackName=stack_name,
-                TemplateBody=template_body,
-                Parameters=params,
-                Capabilities=['CAPABILITY_NAMED_IAM', 'CAPABILITY_AUTO_EXPAND']
-            )
-            wait_for_stack(stack_name, 'update')
-        except ClientError as e:
-            if 'No updates are to be performed' in str(e):
-                print(f"No update required for stack {stack_name}\n")
-            else:
-                print(f"Failed to update stack {stack_name}: {e}")
+    exists = stack_exists(stack_name)
+    with deployment_history.track(stack_name, "update" if exists else "create",
+                                  tenant=parameters.get("ProjectName"), region=cf.meta.region_name,
+                                  template_body=template_body) as run:
+        run["polls"] = None  # the boto3 waiter does not expose its poll count
+        if exists:
+            print(f"Updating stack: {stack_name}")
+            try:
+                cf.update_stack(
+                    StackName=stack_name,
+                    TemplateBody=template_body,
+                    Parameters=params,
+                    Capabilities=['CAPABILITY_NAMED_IAM', 'CAPABILITY_AUTO_EXPAND'],
+                    Tags=stack_inventory.stack_tags("integration", parameters)
+                )
+                wait_for_stack(stack_name, 'update')
+            except ClientError as e:
+                if 'No updates are to be performed' in str(e):
+                    print(f"No update required for stack {stack_name}\n")
+                    run["outcome"] = "NO_CHANGE"
+                else:
+                    print(f"Failed to update stack {stack_name}: {e}")
+                    print_stack_events(stack_name)
+                    sys.exit(1)
+        else:
+            print(f"Creating stack: {stack_name}")
+            try:
+                cf.create_stack(
+                    StackName=stack_name,
+                    TemplateBody=template_body,
+                    Parameters=params,
+                    Capabilities=['CAPABILITY_NAMED_IAM', 'CAPABILITY_AUTO_EXPAND'],
+                    Tags=stack_inventory.stack_tags("integration", parameters)
+                )
+                wait_for_stack(stack_name, 'create')
+            except ClientError as e:
+                print(f"Failed to create stack {stack_name}: {e}")
                 print_stack_events(stack_name)
                 sys.exit(1)
-    else:
-        print(f"Creating stack: {stack_name}")
-        try:
-            cf.create_stack(
-                StackName=stack_name,
-                TemplateBody=template_body,
-                Parameters=params,
-                Capabilities=['CAPABILITY_NAMED_IAM', 'CAPABILITY_AUTO_EXPAND']
-            )
-            wait_for_stack(stack_name, 'create')
-        except ClientError as e:
-            print(f"Failed to create stack {stack_name}: {e}")
-            print_stack_events(stack_name)
-            sys.exit(1)
 
 def get_stack_output(stack_name, output_key):
     try:
@@ -127,14 +185,7 @@ def get_certificate_arn(project_name):
         sys.exit(1)
 
 def print_stack_events(stack_name):
-    try:
-        events = cf.describe_stack_events(StackName=stack_name)['StackEvents']
-        print(f"Recent events for stack '{stack_name}':")
-        for event in sorted(events, key=lambda e: e['Timestamp'], reverse=True)[:10]:
-            status_reason = event.get('ResourceStatusReason', '')
-            print(f"{event['Timestamp']} {event['ResourceStatus']} {event['ResourceType']} {event['LogicalResourceId']} {status_reason}")
-    except Exception as e:
-        print(f"Could not retrieve stack events for debugging: {e}")
+    stack_diagnostics.report_failure(cf, stack_name)
 
 def join_list_to_string(value):
     return ",".join(value) if isinstance(value, list) else value
@@ -159,7 +210,7 @@ def main():
 
     list_keys_to_check = [
         "AvailabilityZones", "PublicSubnetCidrs", "PrivateSubnetCidrs",
-        "ALBSubnetCidrs", "GWLBSubnetCidrs", "SFTPSubnetCidrs"
+        "ALBSubnetCidrs", "GWLBSubnetCidrs", "SFTPSubnetCidrs", "EndpointSubnetCidrs"
     ]
     for key in list_keys_to_check:
         if key in base_params:
@@ -168,7 +219,31 @@ def main():
                 print(f"Each subnet CIDR list and AZ list must contain at least 3 entries for '{key}'.")
                 sys.exit(1)
 
-    deploy_stack("VpcStack", read_template_file(os.path.join(base_path, "vpc.yaml")), {
+    # Check the compiled values this run deploys, not the raw file, so overlays are covered too.
+    params_file = os.path.abspath(os.path.join(param_path, "parameters.json"))
+    plans = [plan for plan in cidr_planner.load_plans() if plan["source"] != params_file]
+    plans.append(cidr_planner.plan_from_parameters(base_params, params_file))
+    cidr_problems = [message for source, message in cidr_planner.check_plans(plans) if source == params_file]
+    if cidr_problems:
+        print("CIDR plan conflicts found:")
+        for message in cidr_problems:
+            print(f"  {message}")
+        sys.exit(1)
+
+    if not base_params.get("EndpointSubnetCidrs"):
+        # A derived value would move whenever the other subnets change, replacing the
+        # endpoint subnets, so the operator has to set it; suggest free ranges.
+        print(f"Required parameter 'EndpointSubnetCidrs' is missing. Add it to {params_file} "
+              f"or an overlay: {ENDPOINT_SUBNET_COUNT} comma-separated CIDRs inside VpcCidr, one per AZ.")
+        try:
+            blocks = cidr_planner.allocate_subnets(cidr_planner.plan_from_parameters(base_params, params_file),
+                                                   ENDPOINT_SUBNET_COUNT, ENDPOINT_SUBNET_PREFIX)
+            print(f"Free ranges that would fit: {','.join(str(block) for block in blocks)}")
+        except ValueError as e:
+            print(f"No free /{ENDPOINT_SUBNET_PREFIX} ranges to suggest: {e}")
+        sys.exit(1)
+
+    deploy_stack("VpcStack", os.path.join(base_path, "vpc.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcCidr": base_params["VpcCidr"]
     })
@@ -176,19 +251,19 @@ def main():
 
     base_params["VpcId"] = vpc_id
 
-    deploy_stack("IgwStack", read_template_file(os.path.join(base_path, "igw.yaml")), {
+    deploy_stack("IgwStack", os.path.join(base_path, "igw.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcId": vpc_id
     })
     igw_id = get_stack_output("IgwStack", "InternetGatewayId")
 
-    deploy_stack("VgwStack", read_template_file(os.path.join(base_path, "vgw.yaml")), {
+    deploy_stack("VgwStack", os.path.join(base_path, "vgw.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcId": vpc_id
     })
     vgw_id = get_stack_output("VgwStack", "VpnGatewayId")
 
-    subnets_template = read_template_file(os.path.join(base_path, "subnets.yaml"))
+    subnets_template = os.path.join(base_path, "subnets.yaml")
     subnet_parameters = {
         "ProjectName": base_params["ProjectName"],
         "AvailabilityZones": join_list_to_string(base_params["AvailabilityZones"]),
@@ -197,6 +272,7 @@ def main():
         "ALBSubnetCidrs": join_list_to_string(base_params["ALBSubnetCidrs"]),
         "GWLBSubnetCidrs": join_list_to_string(base_params["GWLBSubnetCidrs"]),
         "SFTPSubnetCidrs": join_list_to_string(base_params["SFTPSubnetCidrs"]),
+        "EndpointSubnetCidrs": join_list_to_string(base_params["EndpointSubnetCidrs"]),
         "VpcId": base_params["VpcId"]
     }
 
@@ -209,8 +285,9 @@ def main():
     alb_subnet_ids = get_stack_output("SubnetStack", "ALBSubnetIds")
     gwlb_subnet_ids = get_stack_output("SubnetStack", "GWLBSubnetIds")
     sftp_subnet_ids = get_stack_output("SubnetStack", "SFTPSubnetIds")
+    endpoint_subnet_ids = get_stack_output("SubnetStack", "EndpointSubnetIds")
 
-    deploy_stack("SecurityGroupsStack", read_template_file(os.path.join(base_path, "security-groups.yaml")), {
+    deploy_stack("SecurityGroupsStack", os.path.join(base_path, "security-groups.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcId": vpc_id
     })
@@ -220,7 +297,7 @@ def main():
     gwlb_sg_id = get_stack_output("SecurityGroupsStack", "GWLBSecurityGroupId")
     sftp_sg_id = get_stack_output("SecurityGroupsStack", "SFTPSecurityGroupId")
 
-    deploy_stack("RouteTablesStack", read_template_file(os.path.join(base_path, "route-tables.yaml")), {
+    deploy_stack("RouteTablesStack", os.path.join(base_path, "route-tables.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcId": vpc_id,
         "InternetGatewayId": igw_id,
@@ -231,28 +308,53 @@ def main():
         "SFTPSubnetIds": join_list_to_string(sftp_subnet_ids),
     })
 
-    deploy_stack("Route53Stack", read_template_file(os.path.join(base_path, "route53-private-hosted-zone.yaml")), {
+    route_table_ids = [
+        get_stack_output("RouteTablesStack", "PublicRouteTableId"),
+        get_stack_output("RouteTablesStack", "PrivateRouteTableId"),
+        get_stack_output("RouteTablesStack", "ALBRouteTableId"),
+        get_stack_output("RouteTablesStack", "GWLBRouteTableId"),
+        get_stack_output("RouteTablesStack", "SFTPRouteTableId"),
+    ]
+
+    vpc_endpoint_parameters = {
+        "ProjectName": base_params["ProjectName"],
+        "VpcId": vpc_id,
+        "VpcCidr": base_params["VpcCidr"],
+        "RouteTableIds": join_list_to_string(route_table_ids),
+        "EndpointSubnetIds": join_list_to_string(endpoint_subnet_ids),
+    }
+    # Interface endpoint switches (EnableEcrEndpoints, EnableKmsEndpoint, ...) are
+    # optional; the template defaults apply to any left out of the parameters.
+    vpc_endpoint_parameters.update({
+        k: v for k, v in base_params.items() if k.startswith("Enable") and k.endswith(("Endpoint", "Endpoints"))
+    })
+
+    deploy_stack("VpcEndpointsStack", os.path.join(base_path, "vpc-endpoints.yaml"),
+                 vpc_endpoint_parameters)
+
+    deploy_stack("Route53Stack", os.path.join(base_path, "route53-private-hosted-zone.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcId": vpc_id,
         "DomainName": base_params["DomainName"]
     })
 
-    deploy_stack("WAFStack", read_template_file(os.path.join(base_path, "waf.yaml")), {
+    deploy_stack("WAFStack", os.path.join(base_path, "waf.yaml"), {
         "ProjectName": base_params["ProjectName"]
     })
     waf_arn = get_stack_output("WAFStack", "WebACLArn")
 
-    deploy_stack("ALBStack", read_template_file(os.path.join(base_path, "alb.yaml")), {
+    deploy_stack("ALBStack", os.path.join(base_path, "alb.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "ALBSubnetIds": join_list_to_string(alb_subnet_ids),
         "ALBSecurityGroupId": alb_sg_id,
         "TargetGroupSecurityGroupId": tgtgrp_sg_id,
         "ACMCertificateArn": base_params["ACMCertificateArn"],
         "WAFWebACLArn": waf_arn,
-        "VpcId": vpc_id
+        "VpcId": vpc_id,
+        **{key: base_params[key] for key in ALB_TUNING_KEYS if key in base_params}
     })
 
-    deploy_stack("SFTPStack", read_template_file(os.path.join(base_path, "sftp-endpoint.yaml")), {
+    deploy_stack("SFTPStack", os.path.join(base_path, "sftp-endpoint.yaml"), {
         "ProjectName": base_params["ProjectName"],
         "VpcId": vpc_id,
         "SubnetIds": join_list_to_string(sftp_subnet_ids),
@@ -262,5 +364,14 @@ def main():
     print("\nAll stacks deployed successfully.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deploy the tenant integration stacks.")
+    parser.add_argument("--stacks", help="Comma-separated stack names to deploy (default: all)")
+    args = parser.parse_args()
+    if args.stacks:
+        try:
+            ONLY_STACKS.update(selected_stacks(args.stacks))
+        except ValueError as e:
+            print(f"[FAILED] {e}")
+            sys.exit(1)
     main()
 
@@ -1,56 +1,56 @@
 import boto3
+import os
 import time
 import sys
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")))
+from CF_tenant_common import delete_recovery, dependency_drain, deployment_history, stack_inventory, stack_progress
+
 # ---------------------------
 # AWS CLIENT
 # ---------------------------
 cf = boto3.client('cloudformation')
 
-# ---------------------------
-# STACKS TO DELETE (in reverse order)
-# ---------------------------
-STACKS = [
-    "egressNGWStack",
-    "gwlbeRouteStack",
-    "gwlbeVPCStack",
-    "egressVPCStack"
-]
-
 # ---------------------------
 # HELPER FUNCTIONS
 # ---------------------------
-def delete_stack(stack_name):
+def delete_stack(stack_name, progress):
     print(f"\n[START] Deleting stack: {stack_name}")
-    try:
-        cf.describe_stacks(StackName=stack_name)
-    except ClientError as e:
-        if "does not exist" in str(e):
-            print(f"[SKIP] Stack {stack_name} does not exist.")
-            return
-        else:
-            print(f"[ERROR] Describe failed: {e}")
+    with deployment_history.track(stack_name, "delete", region=cf.meta.region_name) as run:
+        dependency_drain.drain_stack(cf, stack_name)
+        try:
+            cf.delete_stack(StackName=stack_name)
+            print(f"[DELETE] Delete request sent for stack: {stack_name}")
+            wait_for_stack_deletion(stack_name, progress, run)
+        except delete_recovery.DeleteFailed:
+            print(f"[RECOVER] Stack {stack_name} reached DELETE_FAILED; recovering...")
+            retained = delete_recovery.recover(cf, stack_name,
+                                               lambda: wait_for_stack_deletion(stack_name, progress, run))
+            if retained:
+                run["outcome"] = "RETAINED"
+            delete_recovery.report_retained(stack_name, retained)
+        except ClientError as e:
+            print(f"[ERROR] Failed to delete {stack_name}: {e}")
             raise
 
-    try:
-        cf.delete_stack(StackName=stack_name)
-        print(f"[DELETE] Delete request sent for stack: {stack_name}")
-        wait_for_stack_deletion(stack_name)
-    except ClientError as e:
-        print(f"[ERROR] Failed to delete {stack_name}: {e}")
-        raise
-
-def wait_for_stack_deletion(stack_name):
+def wait_for_stack_deletion(stack_name, progress, run=None):
     timeout, interval, elapsed = 900, 10, 0
+    watch = stack_progress.StackWatch(cf, stack_name)
     while elapsed < timeout:
         time.sleep(interval)
         elapsed += interval
+        if run is not None:
+            run["polls"] += 1
         try:
-            cf.describe_stacks(StackName=stack_name)
-            print(f"  → {stack_name} still deleting...")
+            status = cf.describe_stacks(StackName=stack_name)['Stacks'][0]['StackStatus']
+            progress.update(watch.refresh(status))
+            if status == "DELETE_FAILED":
+                progress.finish(stack_name)
+                raise delete_recovery.DeleteFailed(stack_name, status)
         except ClientError as e:
             if "does not exist" in str(e):
+                progress.finish(stack_name)
                 print(f"[COMPLETE] Stack {stack_name} deleted.")
                 return
             else:
@@ -62,9 +62,18 @@ def wait_for_stack_deletion(stack_name):
 # MAIN EXECUTION
 # ---------------------------
 if __name__ == '__main__':
-    for stack_name in STACKS:
+    try:
+        # Live egress stacks from the inventory, in reverse deployment order.
+        stacks = stack_inventory.pipeline_stacks(cf, "egress")
+    except ClientError as e:
+        print(f"[FAILED] Could not list stacks: {e}")
+        sys.exit(1)
+    if not stacks:
+        print("[SKIP] No egress stacks found.")
+    progress = stack_progress.ProgressBoard(on_status=lambda name, status: print(f"  → {name} {status}"))
+    for stack_name in stacks:
         try:
-            delete_stack(stack_name)
+            delete_stack(stack_name, progress)
         except Exception as e:
             print(f"[FAILED] Error deleting {stack_name}: {e}")
             sys.exit(1)
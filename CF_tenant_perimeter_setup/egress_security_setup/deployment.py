@@ -1,10 +1,13 @@
+import argparse
 import boto3
-import json
 import os
 import time
 import sys
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")))
+from CF_tenant_common import deployment_history, parameter_compiler, stack_diagnostics, stack_inventory, stack_progress
+
 # ---------------------------
 # AWS CLIENT
 # ---------------------------
@@ -45,19 +48,25 @@ def load_template_body(template_path):
     with open(template_path, 'r') as f:
         return f.read()
 
-def load_parameters(params_path):
-    if not os.path.isfile(params_path):
-        raise FileNotFoundError(f"Parameter file not found: {params_path}")
-    with open(params_path, 'r') as f:
-        data = json.load(f)
-        if not isinstance(data, list):
-            raise ValueError(f"Parameter file must contain a JSON array: {params_path}")
-        return data
+def load_parameters(params_path, template_path=None, stack_name=None):
+    return parameter_compiler.compile_parameters(
+        params_path, template_path, stack_name, "egress",
+        parameter_compiler.current_context(cf.meta.region_name)
+    )
+
+def selected_stacks(only=None):
+    if not only:
+        return STACKS
+    names = {name.strip() for name in only.split(",") if name.strip()}
+    unknown = names - {stack["name"] for stack in STACKS}
+    if unknown:
+        raise ValueError(f"Unknown stacks requested: {', '.join(sorted(unknown))}")
+    return [stack for stack in STACKS if stack["name"] in names]
 
-def deploy_stack(stack_name, template_path, parameters_path):
+def deploy_stack(stack_name, template_path, parameters_path, progress):
     print(f"\n[START] Deploying stack: {stack_name}")
     template_body = load_template_body(template_path)
-    parameters = load_parameters(parameters_path)
+    parameters = load_parameters(parameters_path, template_path, stack_name)
 
     try:
         cf.describe_stacks(StackName=stack_name)
@@ -68,46 +77,58 @@ def deploy_stack(stack_name, template_path, parameters_path):
         else:
             raise
 
-    try:
-        if operation == "create_stack":
-            response = cf.create_stack(
-                StackName=stack_name,
-                TemplateBody=template_body,
-                Parameters=parameters,
-                Capabilities=['CAPABILITY_NAMED_IAM'],
-                OnFailure='DO_NOTHING'
-            )
-        else:
-            response = cf.update_stack(
-                StackName=stack_name,
-                TemplateBody=template_body,
-                Parameters=parameters,
-                Capabilities=['CAPABILITY_NAMED_IAM']
-            )
-        print(f"[{operation.upper()}] Stack operation started: {response['StackId']}")
-        wait_for_stack(stack_name, operation)
-    except ClientError as e:
-        if "No updates are to be performed" in str(e):
-            print(f"[SKIP] No updates needed for {stack_name}")
-        else:
-            print(f"[ERROR] Failed to {operation} {stack_name}: {e}")
-            raise
+    with deployment_history.track(stack_name, operation.split("_")[0],
+                                  tenant=deployment_history.tenant_from_parameters(parameters),
+                                  region=cf.meta.region_name, template_body=template_body) as run:
+        try:
+            if operation == "create_stack":
+                response = cf.create_stack(
+                    StackName=stack_name,
+                    TemplateBody=template_body,
+                    Parameters=parameters,
+                    Capabilities=['CAPABILITY_NAMED_IAM'],
+                    Tags=stack_inventory.stack_tags("egress", parameters),
+                    OnFailure='DO_NOTHING'
+                )
+            else:
+                response = cf.update_stack(
+                    StackName=stack_name,
+                    TemplateBody=template_body,
+                    Parameters=parameters,
+                    Capabilities=['CAPABILITY_NAMED_IAM'],
+                    Tags=stack_inventory.stack_tags("egress", parameters)
+                )
+            print(f"[{operation.upper()}] Stack operation started: {response['StackId']}")
+            wait_for_stack(stack_name, operation, progress, run)
+        except ClientError as e:
+            if "No updates are to be performed" in str(e):
+                print(f"[SKIP] No updates needed for {stack_name}")
+                run["outcome"] = "NO_CHANGE"
+            else:
+                print(f"[ERROR] Failed to {operation} {stack_name}: {e}")
+                raise
 
-def wait_for_stack(stack_name, operation):
+def wait_for_stack(stack_name, operation, progress, run=None):
     expected_status = "CREATE_COMPLETE" if operation == "create_stack" else "UPDATE_COMPLETE"
     timeout, interval, elapsed = 900, 10, 0
+    watch = stack_progress.StackWatch(cf, stack_name)
 
     while elapsed < timeout:
         time.sleep(interval)
         elapsed += interval
+        if run is not None:
+            run["polls"] += 1
         try:
             response = cf.describe_stacks(StackName=stack_name)
             status = response['Stacks'][0]['StackStatus']
-            print(f"  → {stack_name} Status: {status}")
+            progress.update(watch.refresh(status))
+            if watch.finished:
+                progress.finish(stack_name)
             if status == expected_status:
                 print(f"[COMPLETE] Stack {stack_name} => {status}")
                 return
             elif "FAILED" in status or "ROLLBACK" in status:
+                stack_diagnostics.report_failure(cf, stack_name)
                 raise Exception(f"Stack {stack_name} failed with status: {status}")
         except ClientError as e:
             print(f"[ERROR] Checking stack status failed: {e}")
@@ -118,9 +139,20 @@ def wait_for_stack(stack_name, operation):
 # MAIN EXECUTION
 # ---------------------------
 if __name__ == '__main__':
-    for stack in STACKS:
+    parser = argparse.ArgumentParser(description="Deploy the egress security stacks.")
+    parser.add_argument("--stacks", help="Comma-separated stack names to deploy (default: all)")
+    args = parser.parse_args()
+
+    try:
+        stacks = selected_stacks(args.stacks)
+    except ValueError as e:
+        print(f"[FAILED] {e}")
+        sys.exit(1)
+
+    progress = stack_progress.ProgressBoard(on_status=lambda name, status: print(f"  → {name} Status: {status}"))
+    for stack in stacks:
         try:
-            deploy_stack(stack["name"], stack["template"], stack["parameters"])
+            deploy_stack(stack["name"], stack["template"], stack["parameters"], progress)
         except Exception as e:
             print(f"[FAILED] Error deploying {stack['name']}: {e}")
             sys.exit(1)
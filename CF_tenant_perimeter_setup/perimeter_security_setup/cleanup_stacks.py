@@ -1,9 +1,13 @@
 import boto3
+import os
 import sys
 import time
 import logging
 from botocore.exceptions import ClientError, BotoCoreError
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")))
+from CF_tenant_common import delete_recovery, dependency_drain, deployment_history, stack_inventory, stack_progress
+
 # ---------------------------
 # CONFIGURE LOGGING
 # ---------------------------
@@ -26,55 +30,51 @@ except (BotoCoreError, ClientError) as e:
     logger.exception("Failed to create CloudFormation client.")
     sys.exit(1)
 
-# ---------------------------
-# STACKS TO DELETE (reverse order of deployment)
-# ---------------------------
-STACKS = [
-    "perimetergwlbeStack",
-    "perimeterec2Stack",
-    "perimeterGWLBStack",
-    "perimeterSGStack",
-    "perimeterVPCstack"
-]
-
 # ---------------------------
 # DELETE STACK FUNCTION
 # ---------------------------
-def delete_stack(stack_name):
+def delete_stack(stack_name, progress):
     logger.info(f"[START] Deleting stack: {stack_name}")
-    try:
-        cf.describe_stacks(StackName=stack_name)
-    except ClientError as e:
-        if "does not exist" in str(e):
-            logger.warning(f"[SKIP] Stack {stack_name} does not exist.")
-            return
-        else:
-            logger.error(f"[ERROR] Describe failed for {stack_name}: {e}")
+    with deployment_history.track(stack_name, "delete", region=cf.meta.region_name, log=logger.warning) as run:
+        dependency_drain.drain_stack(cf, stack_name, log=logger.info)
+        try:
+            cf.delete_stack(StackName=stack_name)
+            logger.info(f"[DELETE] Delete request sent for stack: {stack_name}")
+            wait_for_stack_deletion(stack_name, progress, run)
+        except delete_recovery.DeleteFailed:
+            logger.warning(f"[RECOVER] Stack {stack_name} reached DELETE_FAILED; recovering...")
+            retained = delete_recovery.recover(cf, stack_name,
+                                               lambda: wait_for_stack_deletion(stack_name, progress, run),
+                                               log=logger.warning)
+            if retained:
+                run["outcome"] = "RETAINED"
+            delete_recovery.report_retained(stack_name, retained, log=logger.warning)
+        except ClientError as e:
+            logger.error(f"[ERROR] Failed to delete {stack_name}: {e}")
             raise
 
-    try:
-        cf.delete_stack(StackName=stack_name)
-        logger.info(f"[DELETE] Delete request sent for stack: {stack_name}")
-        wait_for_stack_deletion(stack_name)
-    except ClientError as e:
-        logger.error(f"[ERROR] Failed to delete {stack_name}: {e}")
-        raise
-
-def wait_for_stack_deletion(stack_name):
+def wait_for_stack_deletion(stack_name, progress, run=None):
     timeout = 900  # seconds
     interval = 10
     elapsed = 0
 
     logger.info(f"Waiting for stack '{stack_name}' to be deleted...")
+    watch = stack_progress.StackWatch(cf, stack_name)
 
     while elapsed < timeout:
         time.sleep(interval)
         elapsed += interval
+        if run is not None:
+            run["polls"] += 1
         try:
-            cf.describe_stacks(StackName=stack_name)
-            logger.info(f"  -> {stack_name} still deleting...")
+            status = cf.describe_stacks(StackName=stack_name)['Stacks'][0]['StackStatus']
+            progress.update(watch.refresh(status))
+            if status == "DELETE_FAILED":
+                progress.finish(stack_name)
+                raise delete_recovery.DeleteFailed(stack_name, status)
         except ClientError as e:
             if "does not exist" in str(e):
+                progress.finish(stack_name)
                 logger.info(f"[COMPLETE] Stack {stack_name} successfully deleted.")
                 return
             else:
@@ -87,9 +87,14 @@ def wait_for_stack_deletion(stack_name):
 # MAIN EXECUTION
 # ---------------------------
 if __name__ == "__main__":
+    progress = stack_progress.ProgressBoard(on_status=lambda name, status: logger.info(f"  -> {name} {status}"))
     try:
-        for stack_name in STACKS:
-            delete_stack(stack_name)
+        # Live perimeter stacks from the inventory, in reverse deployment order.
+        stacks = stack_inventory.pipeline_stacks(cf, "perimeter")
+        if not stacks:
+            logger.info("[SKIP] No perimeter stacks found.")
+        for stack_name in stacks:
+            delete_stack(stack_name, progress)
     except Exception as e:
         logger.exception(f"[FAILED] Cleanup pipeline stopped: {e}")
         sys.exit(1)
@@ -1,3 +1,4 @@
+import argparse
 import boto3
 import json
 import os
@@ -6,6 +7,9 @@ import sys
 import logging
 from botocore.exceptions import ClientError, BotoCoreError
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")))
+from CF_tenant_common import deployment_history, parameter_compiler, stack_diagnostics, stack_inventory, stack_progress
+
 # ---------------------------
 # CONFIGURE LOGGING
 # ---------------------------
@@ -64,24 +68,29 @@ STACKS = [
 # HELPER FUNCTIONS
 # ---------------------------
 
-def load_parameters(file_path):
-    if not os.path.isfile(file_path):
-        raise FileNotFoundError(f"Parameter file not found: {file_path}")
+def load_parameters(file_path, template_path=None, stack_name=None):
+    """Compile the stack's parameter file with the global/environment/region/tenant overlays."""
     try:
-        with open(file_path, 'r') as f:
-            params = json.load(f)
-            if not isinstance(params, list):
-                raise ValueError("Parameters JSON must be a list of dicts")
-            for p in params:
-                if 'ParameterKey' not in p or 'ParameterValue' not in p:
-                    raise ValueError(f"Malformed parameter: {p}")
-            logger.info(f"Loaded parameters from {file_path}")
-            return params
+        params = parameter_compiler.compile_parameters(
+            file_path, template_path, stack_name, "perimeter",
+            parameter_compiler.current_context(cf.meta.region_name)
+        )
+        logger.info(f"Loaded parameters from {file_path or 'overlays'}")
+        return params
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON in {file_path}: {e}")
         raise
 
-def deploy_stack(stack_name, template_path, parameters_path=None, parameters=None):
+def selected_stacks(only=None):
+    if not only:
+        return STACKS
+    names = {name.strip() for name in only.split(",") if name.strip()}
+    unknown = names - {stack["name"] for stack in STACKS}
+    if unknown:
+        raise ValueError(f"Unknown stacks requested: {', '.join(sorted(unknown))}")
+    return [stack for stack in STACKS if stack["name"] in names]
+
+def deploy_stack(stack_name, template_path, progress, parameters_path=None, parameters=None):
     logger.info(f"[START] Deploying stack: {stack_name}")
 
     if not os.path.isfile(template_path):
@@ -91,7 +100,7 @@ def deploy_stack(stack_name, template_path, parameters_path=None, parameters=Non
         template_body = tf.read()
 
     if parameters is None:
-        parameters = load_parameters(parameters_path) if parameters_path else []
+        parameters = load_parameters(parameters_path, template_path, stack_name)
 
     try:
         cf.describe_stacks(StackName=stack_name)
@@ -102,53 +111,66 @@ def deploy_stack(stack_name, template_path, parameters_path=None, parameters=Non
         else:
             raise
 
-    try:
-        if operation == "create_stack":
-            cf.create_stack(
-                StackName=stack_name,
-                TemplateBody=template_body,
-                Parameters=parameters,
-                Capabilities=['CAPABILITY_NAMED_IAM'],
-                OnFailure='DO_NOTHING',
-                EnableTerminationProtection=False
-            )
-        else:
-            cf.update_stack(
-                StackName=stack_name,
-                TemplateBody=template_body,
-                Parameters=parameters,
-                Capabilities=['CAPABILITY_NAMED_IAM']
-            )
-        logger.info(f"{operation.replace('_', ' ').title()} initiated for {stack_name}")
-    except ClientError as e:
-        if "No updates are to be performed" in str(e):
-            logger.info(f"No updates needed for {stack_name}")
-            return
-        logger.error(f"Failed to {operation} stack {stack_name}: {e}")
-        raise
+    with deployment_history.track(stack_name, operation.split("_")[0],
+                                  tenant=deployment_history.tenant_from_parameters(parameters),
+                                  region=cf.meta.region_name, template_body=template_body,
+                                  log=logger.warning) as run:
+        try:
+            if operation == "create_stack":
+                cf.create_stack(
+                    StackName=stack_name,
+                    TemplateBody=template_body,
+                    Parameters=parameters,
+                    Capabilities=['CAPABILITY_NAMED_IAM'],
+                    Tags=stack_inventory.stack_tags("perimeter", parameters),
+                    OnFailure='DO_NOTHING',
+                    EnableTerminationProtection=False
+                )
+            else:
+                cf.update_stack(
+                    StackName=stack_name,
+                    TemplateBody=template_body,
+                    Parameters=parameters,
+                    Capabilities=['CAPABILITY_NAMED_IAM'],
+                    Tags=stack_inventory.stack_tags("perimeter", parameters)
+                )
+            logger.info(f"{operation.replace('_', ' ').title()} initiated for {stack_name}")
+        except ClientError as e:
+            if "No updates are to be performed" in str(e):
+                logger.info(f"No updates needed for {stack_name}")
+                run["outcome"] = "NO_CHANGE"
+                return
+            logger.error(f"Failed to {operation} stack {stack_name}: {e}")
+            raise
 
-    wait_for_stack_completion(stack_name, operation)
+        wait_for_stack_completion(stack_name, operation, progress, run)
 
-def wait_for_stack_completion(stack_name, operation):
+def wait_for_stack_completion(stack_name, operation, progress, run=None):
     timeout = 900  # 15 minutes
     interval = 10
     elapsed = 0
     expected = "CREATE_COMPLETE" if operation == "create_stack" else "UPDATE_COMPLETE"
 
     logger.info(f"Waiting for stack '{stack_name}' to reach '{expected}'...")
+    watch = stack_progress.StackWatch(cf, stack_name)
 
     while elapsed < timeout:
         time.sleep(interval)
         elapsed += interval
+        if run is not None:
+            run["polls"] += 1
         try:
             response = cf.describe_stacks(StackName=stack_name)
             stack = response['Stacks'][0]
             status = stack['StackStatus']
-            logger.info(f"{stack_name} Status: {status}")
+            progress.update(watch.refresh(status))
+            if watch.finished:
+                progress.finish(stack_name)
             if status == expected:
                 logger.info(f"[COMPLETE] Stack {stack_name} => {status}")
                 return
             elif "FAILED" in status or "ROLLBACK" in status:
+                stack_diagnostics.report_failure(cf, stack_name, log=logger.error)
                 raise Exception(f"Stack {stack_name} failed with status: {status}")
         except ClientError as e:
             error_message = str(e)
@@ -165,13 +187,19 @@ def wait_for_stack_completion(stack_name, operation):
 # MAIN EXECUTION
 # ---------------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deploy the perimeter security stacks.")
+    parser.add_argument("--stacks", help="Comma-separated stack names to deploy (default: all)")
+    args = parser.parse_args()
+
+    progress = stack_progress.ProgressBoard(on_status=lambda name, status: logger.info(f"{name} Status: {status}"))
     try:
-        for stack in STACKS:
-            parameters = load_parameters(stack.get("parameters")) if stack.get("parameters") else []
+        for stack in selected_stacks(args.stacks):
+            parameters = load_parameters(stack.get("parameters"), stack["template"], stack["name"])
             deploy_stack(
                 stack_name=stack["name"],
                 template_path=stack["template"],
-                parameters=parameters
+                parameters=parameters,
+                progress=progress
             )
     except Exception as e:
         logger.exception(f"[FAILED] Deployment pipeline stopped: {e}")
@@ -0,0 +1,307 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import re
+import sys
+
+# ---------------------------
+# PATHS
+# ---------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SPEC_DIR = os.path.join(BASE_DIR, "template_specs")
+CACHE_DIR = os.path.join(BASE_DIR, ".template_cache")
+
+# Bump whenever the rendering below changes so cached output is not reused.
+GENERATOR_VERSION = "2"
+
+INDENT = "  "
+MAX_INLINE_WIDTH = 100
+PLAIN_SCALAR = re.compile(r"^[A-Za-z0-9_./@(][A-Za-z0-9_./:@() \-]*(?<![ :])$")
+AMBIGUOUS_SCALAR = re.compile(
+    r"^([-+]?[0-9][0-9_.:\-]*|true|false|yes|no|on|off|null|~)$", re.IGNORECASE
+)
+SHORT_FORM = {
+    "Ref": "!Ref",
+    "Fn::Sub": "!Sub",
+    "Fn::GetAtt": "!GetAtt",
+    "Fn::Select": "!Select",
+    "Fn::Join": "!Join",
+    "Fn::Split": "!Split",
+    "Fn::GetAZs": "!GetAZs",
+    "Fn::If": "!If",
+    "Fn::Equals": "!Equals",
+    "Fn::Not": "!Not",
+    "Fn::And": "!And",
+    "Fn::Or": "!Or",
+    "Condition": "!Condition",
+}
+EACH_AZ = "$each_az"
+
+# ---------------------------
+# SPEC EXPANSION
+# ---------------------------
+def substitute(value, az_count, az=None):
+    """Replace {az}, {index} and {az_count} placeholders throughout a spec value."""
+    if isinstance(value, dict):
+        if set(value) == {EACH_AZ}:
+            return [substitute(value[EACH_AZ], az_count, n) for n in range(1, az_count + 1)]
+        return {
+            substitute(k, az_count, az): substitute(v, az_count, az)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [substitute(v, az_count, az) for v in value]
+    if isinstance(value, str):
+        if az is not None:
+            if value == "{index}":
+                return az - 1
+            value = value.replace("{az}", str(az)).replace("{index}", str(az - 1))
+        return value.replace("{az_count}", str(az_count))
+    return value
+
+
+def bind(value, variables):
+    """Replace {name} placeholders for a block's for_each variables."""
+    if isinstance(value, dict):
+        return {bind(k, variables): bind(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [bind(v, variables) for v in value]
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace("{" + name + "}", str(replacement))
+    return value
+
+
+def expand_blocks(blocks, az_count):
+    """Expand a section's blocks into an ordered list of (comment, name, body)."""
+    entries = []
+    repeated = []
+    for block in blocks:
+        template = {k: v for k, v in block.items() if k != "for_each"}
+        repeated.extend(bind(template, variables) for variables in block.get("for_each", [{}]))
+
+    for block in repeated:
+        comment = substitute(block.get("comment"), az_count)
+        items = block["items"]
+        if not block.get("per_az"):
+            expanded = [(name, substitute(body, az_count)) for name, body in items.items()]
+        elif block.get("layout", "grouped") == "interleaved":
+            expanded = [
+                (substitute(name, az_count, az), substitute(body, az_count, az))
+                for az in range(1, az_count + 1)
+                for name, body in items.items()
+            ]
+        else:
+            expanded = [
+                (substitute(name, az_count, az), substitute(body, az_count, az))
+                for name, body in items.items()
+                for az in range(1, az_count + 1)
+            ]
+        for position, (name, body) in enumerate(expanded):
+            entries.append((comment if position == 0 else None, name, body))
+    return entries
+
+# ---------------------------
+# YAML EMITTER
+# ---------------------------
+def format_scalar(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if value == "":
+        return '""'
+    if AMBIGUOUS_SCALAR.match(value):
+        return "'" + value + "'"
+    if PLAIN_SCALAR.match(value) and ": " not in value:
+        return value
+    return json.dumps(value)
+
+
+def intrinsic(value):
+    if isinstance(value, dict) and len(value) == 1:
+        key = next(iter(value))
+        if key in SHORT_FORM:
+            return SHORT_FORM[key], value[key]
+    return None, None
+
+
+def format_inline(value):
+    """Return a single-line flow rendering of value, or None if it needs block style."""
+    tag, arg = intrinsic(value)
+    if tag:
+        if tag == "!Sub" and isinstance(arg, str):
+            return f"{tag} {json.dumps(arg)}"
+        rendered = format_inline(arg)
+        return f"{tag} {rendered}" if rendered is not None else None
+    if isinstance(value, list):
+        parts = [format_inline(v) for v in value]
+        if any(p is None for p in parts):
+            return None
+        return "[" + ", ".join(parts) + "]"
+    if isinstance(value, dict):
+        return None
+    if isinstance(value, str) and "\n" in value:
+        return None
+    return format_scalar(value)
+
+
+def block_intrinsic(value, inline, width):
+    """Return (tag, args) when a function call is too long or too nested for one line."""
+    tag, arg = intrinsic(value)
+    if tag and isinstance(arg, list) and (inline is None or width > MAX_INLINE_WIDTH):
+        return tag, arg
+    return None, None
+
+
+def emit_value(key, value, depth, lines):
+    pad = INDENT * depth
+    inline = format_inline(value)
+    tag, arg = block_intrinsic(value, inline, len(f"{pad}{key}: {inline}"))
+    if tag:
+        lines.append(f"{pad}{key}: {tag}")
+        emit_sequence(arg, depth + 1, lines)
+    elif inline is not None and not (isinstance(value, list) and not intrinsic(value)[0] and value):
+        lines.append(f"{pad}{key}: {inline}")
+    elif isinstance(value, dict):
+        lines.append(f"{pad}{key}:")
+        emit_mapping(value, depth + 1, lines)
+    elif isinstance(value, list):
+        lines.append(f"{pad}{key}:")
+        emit_sequence(value, depth + 1, lines)
+    else:
+        lines.append(f"{pad}{key}: >")
+        lines.extend(f"{pad}{INDENT}{line}" for line in value.strip().splitlines())
+
+
+def emit_mapping(mapping, depth, lines):
+    for key, value in mapping.items():
+        emit_value(key, value, depth, lines)
+
+
+def emit_sequence(items, depth, lines):
+    pad = INDENT * depth
+    for item in items:
+        inline = format_inline(item)
+        tag, arg = block_intrinsic(item, inline, len(f"{pad}- {inline}"))
+        if tag:
+            lines.append(f"{pad}- {tag}")
+            emit_sequence(arg, depth + 1, lines)
+            continue
+        if inline is not None and (len(f"{pad}- {inline}") <= MAX_INLINE_WIDTH or not isinstance(item, list)):
+            lines.append(f"{pad}- {inline}")
+            continue
+        nested = []
+        if isinstance(item, dict):
+            emit_mapping(item, depth + 1, nested)
+        else:
+            emit_sequence(item, depth + 1, nested)
+        nested[0] = f"{pad}- {nested[0].lstrip()}"
+        lines.extend(nested)
+
+
+def render(spec, az_count=None):
+    az_count = az_count or spec["az_count"]
+    if az_count < 1:
+        raise ValueError("az_count must be at least 1")
+
+    lines = [
+        f"# Generated by template_generator.py from template_specs/{spec['name']}.json.",
+        "# Edit the spec and re-run the generator instead of editing this file.",
+        "AWSTemplateFormatVersion: '2010-09-09'",
+    ]
+    emit_value("Description", substitute(spec["description"], az_count), 0, lines)
+
+    for section in ("Parameters", "Conditions", "Resources", "Outputs"):
+        blocks = spec.get(section.lower())
+        if not blocks:
+            continue
+        lines.append("")
+        lines.append(f"{section}:")
+        for position, (comment, name, body) in enumerate(expand_blocks(blocks, az_count)):
+            if position:
+                lines.append("")
+            if comment:
+                lines.append(f"{INDENT}# {comment}")
+            emit_value(name, body, 1, lines)
+    return "\n".join(lines) + "\n"
+
+# ---------------------------
+# CACHE AND OUTPUT
+# ---------------------------
+def load_spec(spec_path):
+    with open(spec_path, "r") as f:
+        spec = json.load(f)
+    spec.setdefault("name", os.path.splitext(os.path.basename(spec_path))[0])
+    for key in ("output", "az_count", "description"):
+        if key not in spec:
+            raise ValueError(f"Spec {spec_path} is missing required key '{key}'")
+    return spec
+
+
+def spec_hash(spec, az_count):
+    payload = copy.deepcopy(spec)
+    payload["az_count"] = az_count
+    canonical = json.dumps(payload, separators=(",", ":"))
+    return hashlib.sha256(f"{GENERATOR_VERSION}:{canonical}".encode("utf-8")).hexdigest()
+
+
+def render_cached(spec, az_count=None):
+    az_count = az_count or spec["az_count"]
+    digest = spec_hash(spec, az_count)
+    cache_path = os.path.join(CACHE_DIR, f"{digest}.yaml")
+    if os.path.isfile(cache_path):
+        with open(cache_path, "r") as f:
+            return digest, f.read()
+
+    content = render(spec, az_count)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path, "w", newline="\n") as f:
+        f.write(content)
+    return digest, content
+
+
+def generate(spec_path, az_count=None, check=False):
+    """Render one spec; returns True when the output file is (or would be) changed."""
+    spec = load_spec(spec_path)
+    digest, content = render_cached(spec, az_count)
+    output_path = os.path.join(BASE_DIR, spec["output"])
+
+    current = None
+    if os.path.isfile(output_path):
+        with open(output_path, "r") as f:
+            current = f.read()
+    if current == content:
+        print(f"[UNCHANGED] {spec['output']} ({digest[:12]})")
+        return False
+    if check:
+        print(f"[STALE] {spec['output']} does not match {spec['name']}.json ({digest[:12]})")
+        return True
+
+    with open(output_path, "w", newline="\n") as f:
+        f.write(content)
+    print(f"[RENDERED] {spec['output']} ({digest[:12]})")
+    return True
+
+# ---------------------------
+# MAIN EXECUTION
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render N-AZ CloudFormation templates from template specs.")
+    parser.add_argument("specs", nargs="*", help="Spec files to render (default: every spec in template_specs/)")
+    parser.add_argument("--az-count", type=int, help="Override the AZ count declared in each spec")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if any template is out of date")
+    args = parser.parse_args()
+
+    spec_paths = args.specs or sorted(
+        os.path.join(SPEC_DIR, name) for name in os.listdir(SPEC_DIR) if name.endswith(".json")
+    )
+    try:
+        changed = [path for path in spec_paths if generate(path, args.az_count, args.check)]
+    except (OSError, ValueError) as e:
+        print(f"[FAILED] Template generation stopped: {e}")
+        sys.exit(1)
+    if args.check and changed:
+        sys.exit(1)